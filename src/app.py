@@ -1,14 +1,38 @@
+import multiprocessing
+
 from PySide6.QtWidgets import QApplication
 
 from core.utils.config_manager import config
 from core.widget.main_window import MainWindow
 from core.plugin_manager import plugins
+from core.utils.metrics import metrics, MetricsExporter
+from core.utils.profiler import profiler
+from core.utils.task_journal import task_journal
+from core.worker.autoscaler import PoolAutoscaler
+from core.worker.io_worker_manager import io_worker_manager
+from core.worker.worker_manager import worker_manager
 
 
 class MyApp():
     def __init__(self):
         super().__init__()
         self.app = QApplication()
+        self.app.aboutToQuit.connect(self.shutdown)
+
+        self.metrics_exporter = None
+        metrics_config = config["metrics"]
+        if metrics_config["enabled"]:
+            self.metrics_exporter = MetricsExporter(
+                metrics, metrics_config["target"], metrics_config["format"], metrics_config["interval"]
+            )
+            self.metrics_exporter.start()
+
+        self.autoscaler = None
+        autoscale_config = config["worker"]["autoscale"]
+        if autoscale_config["enabled"]:
+            options = {k: v for k, v in autoscale_config.items() if k != "enabled"}
+            self.autoscaler = PoolAutoscaler(worker_manager, io_worker_manager, **options)
+            self.autoscaler.start()
 
         plugins.load_plugins()
 
@@ -19,9 +43,22 @@ class MyApp():
     def run(self):
         self.app.exec()
 
+    def shutdown(self):
+        """事件循环退出前关闭线程池、进程池与 IO 事件循环"""
+        if self.autoscaler:
+            self.autoscaler.stop()
+        worker_manager.shutdown()
+        io_worker_manager.shutdown()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        profiler.dump()
+        task_journal.close()
+
     def __del__(self):
         config.save()
 
 
 if __name__ == "__main__":
+    # 打包为可执行文件后，进程池子进程需要
+    multiprocessing.freeze_support()
     MyApp().run()
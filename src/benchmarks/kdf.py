@@ -0,0 +1,118 @@
+"""
+KDF 基准测试：各 KDF 与参数组合的单次派生耗时、吞吐与内存占用，并给出本机的校准结果
+
+用法（在 src 目录下）：
+    python -m benchmarks.kdf                        运行全部参数组合
+    python -m benchmarks.kdf --quick                每组只派生一次，跳过内存测量
+    python -m benchmarks.kdf --target 0.5           校准目标改为 0.5 秒
+
+memory_bytes 为按参数计算的理论值；peak_rss_bytes 在独立子进程中测量派生前后的峰值 RSS 增量，
+    仅在提供 resource 模块的平台（Linux / macOS）上可用，其余平台为 null
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+from plugins.encryptor.utils import kdf as kdfs
+
+PARAM_SETS = [
+    kdfs.Pbkdf2Kdf(100_000),
+    kdfs.Pbkdf2Kdf(300_000),
+    kdfs.Pbkdf2Kdf(600_000),
+    kdfs.ScryptKdf(14, 8, 1),
+    kdfs.ScryptKdf(15, 8, 1),
+    kdfs.ScryptKdf(16, 8, 1),
+    kdfs.ScryptKdf(17, 8, 1),
+]
+
+
+def bench_kdf(kdf, rounds, measure_memory):
+    seconds = kdfs.measure(kdf, rounds)
+    return {
+        "kdf": repr(kdf),
+        "rounds": rounds,
+        "derive_seconds": seconds,
+        "derives_per_second": 1 / seconds if seconds else None,
+        "memory_bytes": kdf.memory_bytes(),
+        "peak_rss_bytes": _peak_rss(kdf) if measure_memory else None,
+    }
+
+
+def run_all(quick=False, target_seconds=0.2, max_memory=64 << 20):
+    rounds = 1 if quick else 5
+    results = [bench_kdf(kdf, rounds, not quick) for kdf in PARAM_SETS]
+
+    calibrated = {}
+    for name in kdfs.KDFS_BY_NAME:
+        start = time.perf_counter()
+        kdf = kdfs.calibrate(name, target_seconds, max_memory)
+        calibrated[name] = {
+            "kdf": repr(kdf),
+            "calibration_seconds": time.perf_counter() - start,
+            "derive_seconds": kdfs.measure(kdf),
+            "memory_bytes": kdf.memory_bytes(),
+        }
+    return {"param_sets": results, "calibrated": calibrated}
+
+
+# helpers
+def _rss_probe(kdf, queue):
+    """子进程：派生前后的峰值 RSS 之差"""
+    import resource
+
+    # Linux 的单位为 KB，macOS 为字节
+    unit = 1 if sys.platform == "darwin" else 1024
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    kdf.derive(b"benchmark", bytes(16))
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((after - before) * unit)
+
+
+def _peak_rss(kdf):
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        return None
+
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_rss_probe, args=(kdf, queue))
+    process.start()
+    value = queue.get()
+    process.join()
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AzurCore KDF 基准测试")
+    parser.add_argument("--output", default="bench_kdf.json", help="结果 JSON 路径")
+    parser.add_argument("--target", type=float, default=0.2, help="校准的目标派生耗时（秒）")
+    parser.add_argument("--max-memory", type=int, default=64 << 20, help="scrypt 校准的内存上限（字节）")
+    parser.add_argument("--quick", action="store_true", help="减少派生次数并跳过内存测量")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+            "target_seconds": args.target,
+        },
+        "results": run_all(args.quick, args.target, args.max_memory),
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+任务框架无界面基准测试，在 QCoreApplication + offscreen 平台下运行
+
+用法（在 src 目录下）：
+    python -m benchmarks.task_framework                     运行并与基准比较
+    python -m benchmarks.task_framework --save-baseline     运行并保存为新基准
+    python -m benchmarks.task_framework --quick             减少迭代次数，快速检查
+
+结果以 JSON 写入 --output，与 --baseline 比较时任一指标退化超过 --tolerance 则返回码为 1
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+# 必须在创建任何 Qt 对象之前设置，core 中的单例在导入时即创建线程与事件循环
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication, QEventLoop, QObject, Signal
+
+app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+from core.base.base_service import BaseService, BatchedService
+from core.base.base_task import AsyncTask, BaseTask, StreamingTask
+from core.utils.timeout_timer import summarize
+from core.worker.io_worker_manager import io_worker_manager
+from core.worker.worker_manager import worker_manager
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# 指标方向：True 表示越大越好，其余指标越小越好
+HIGHER_IS_BETTER = {"tasks_per_second", "emits_per_second"}
+
+
+class NoopTask(BaseTask):
+    def __init__(self):
+        super().__init__("NoopTask")
+
+    def execute(self):
+        return None
+
+
+class NoopAsyncTask(AsyncTask):
+    def __init__(self):
+        super().__init__("NoopAsyncTask")
+
+    async def execute(self):
+        return None
+
+
+class CountingStreamTask(StreamingTask):
+    def __init__(self, n):
+        super().__init__("CountingStreamTask")
+        self.n = n
+
+    def execute(self):
+        yield from range(self.n)
+
+
+class BenchService(BaseService):
+    def __init__(self, use_completion_channel=False):
+        super().__init__("BenchService")
+        self.use_completion_channel = use_completion_channel
+
+
+class BenchBatchedService(BatchedService):
+    def __init__(self, interval):
+        super().__init__("BenchBatchedService", interval, max_load=10 ** 9)
+
+    def load_size(self, task):
+        return 1
+
+
+class Emitter(QObject):
+    ping = Signal(int)
+
+
+# helpers
+def wait_until(predicate, timeout=30.0):
+    """处理事件直到 predicate 成立"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("基准测试等待超时")
+        app.processEvents(QEventLoop.AllEvents, 1)
+
+
+def round_trip(submit, completed_signal, iterations):
+    """逐个提交，测量提交到完成信号到达主线程的延迟"""
+    samples = []
+    done = []
+    completed_signal.connect(lambda *args: done.append(time.perf_counter()))
+
+    for _ in range(iterations):
+        count = len(done)
+        start = time.perf_counter()
+        submit()
+        wait_until(lambda: len(done) > count)
+        samples.append(done[-1] - start)
+    return summarize(samples)
+
+
+# benchmarks
+def bench_worker_throughput(n):
+    """WorkerManager 吞吐：一次性提交 n 个空任务，直到全部 finished 信号到达主线程"""
+    finished = []
+    tasks = [NoopTask() for _ in range(n)]
+    for task in tasks:
+        task.finished.connect(lambda *args: finished.append(1))
+
+    start = time.perf_counter()
+    for task in tasks:
+        worker_manager.execute(task, owner="bench")
+    wait_until(lambda: len(finished) == n)
+    elapsed = time.perf_counter() - start
+
+    return {"tasks": n, "seconds": elapsed, "tasks_per_second": n / elapsed}
+
+
+def bench_deliver_latency(n, use_completion_channel=False):
+    """BaseService.deliver -> task_completed 延迟"""
+    service = BenchService(use_completion_channel)
+    return round_trip(lambda: service.deliver(NoopTask()), service.task_completed, n)
+
+
+def bench_batched_flush_latency(n, interval):
+    """BatchedService 由定时器交付时，deliver -> task_completed 延迟"""
+    service = BenchBatchedService(interval)
+    result = round_trip(lambda: service.deliver(NoopTask()), service.task_completed, n)
+    service.timeout_timer.stop()
+    result["interval_ms"] = interval
+    return result
+
+
+def bench_signal_cost(n):
+    """跨线程信号：工作线程 emit 的开销，以及全部到达主线程的总耗时"""
+    emitter = Emitter()
+    received = []
+    emitter.ping.connect(lambda value: received.append(value))
+    emit_seconds = []
+
+    def produce():
+        start = time.perf_counter()
+        for i in range(n):
+            emitter.ping.emit(i)
+        emit_seconds.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=produce)
+    thread.start()
+    wait_until(lambda: len(received) == n)
+    elapsed = time.perf_counter() - start
+    thread.join()
+
+    return {
+        "emits": n,
+        "emit_seconds_per_call": emit_seconds[0] / n,
+        "delivery_seconds": elapsed,
+        "emits_per_second": n / elapsed,
+    }
+
+
+def bench_stream(n):
+    """StreamingTask：首块到达主线程的延迟与全部条目到达的总耗时"""
+    service = BenchService()
+    received = []
+    first = []
+    done = []
+
+    def on_chunk(task, items):
+        if not first:
+            first.append(time.perf_counter())
+        received.append(len(items))
+
+    service.results_streamed.connect(on_chunk)
+    service.task_completed.connect(lambda *args: done.append(time.perf_counter()))
+
+    start = time.perf_counter()
+    service.deliver(CountingStreamTask(n))
+    wait_until(lambda: done)
+    return {
+        "items": n,
+        "first_chunk_seconds": first[0] - start,
+        "seconds": done[0] - start,
+        "chunks": len(received),
+    }
+
+
+def bench_io_round_trip(n):
+    """IOWorkerManager 协程往返：submit -> finished 信号到达主线程"""
+    samples = []
+    for _ in range(n):
+        done = []
+        task = NoopAsyncTask()
+        task.finished.connect(lambda *args: done.append(time.perf_counter()))
+        start = time.perf_counter()
+        io_worker_manager.submit(task)
+        wait_until(lambda: done)
+        samples.append(done[0] - start)
+    return summarize(samples)
+
+
+def run_all(quick=False):
+    scale = 10 if quick else 1
+    return {
+        "worker_throughput": bench_worker_throughput(20000 // scale),
+        "deliver_latency": bench_deliver_latency(2000 // scale),
+        "deliver_latency_channel": bench_deliver_latency(2000 // scale, use_completion_channel=True),
+        "batched_flush_latency": bench_batched_flush_latency(200 // scale, interval=5),
+        "signal_cost": bench_signal_cost(100000 // scale),
+        "io_round_trip": bench_io_round_trip(2000 // scale),
+        "stream": bench_stream(100000 // scale),
+    }
+
+
+# baseline
+def compare(results, baseline, tolerance):
+    """返回退化超过 tolerance 的指标列表"""
+    regressions = []
+    for name, metrics in results.items():
+        base_metrics = baseline.get(name, {})
+        for key, value in metrics.items():
+            base = base_metrics.get(key)
+            if not isinstance(base, (int, float)) or not base or key in ("tasks", "emits", "items", "chunks", "iterations", "interval_ms"):
+                continue
+
+            ratio = value / base
+            worse = ratio < 1 - tolerance if key in HIGHER_IS_BETTER else ratio > 1 + tolerance
+            if worse:
+                regressions.append(f"{name}.{key}: {base:.6g} -> {value:.6g} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AzurCore 任务框架基准测试")
+    parser.add_argument("--output", default="bench_output.json", help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基准 JSON 路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基准")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument("--quick", action="store_true", help="减少迭代次数")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": run_all(args.quick),
+    }
+
+    worker_manager.shutdown()
+    io_worker_manager.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"基准已保存到 {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"未找到基准 {args.baseline}，跳过比较")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("quick") != args.quick:
+        print("警告: 基准与本次运行的 --quick 设置不同，结果不可直接比较")
+    regressions = compare(report["results"], baseline["results"], args.tolerance)
+    for line in regressions:
+        print(f"退化: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
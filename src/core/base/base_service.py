@@ -1,8 +1,13 @@
+import time
+
+from core.utils.adaptive_batch import AdaptiveBatchController
 from core.utils.timeout_timer import TimeoutTimer
 from core.worker.worker_manager import worker_manager
 from PySide6.QtCore import Signal, QObject
-from core.base.base_task import BaseTask
+from core.base.base_task import BaseTask, BatchTask, StreamingTask, TaskCancelled, TaskDeadlineExceeded
 from core.utils.logger import logger
+from core.utils.profiler import profiler
+from core.utils.result_cache import ResultCache
 
 
 class BaseService(QObject):
@@ -10,12 +15,26 @@ class BaseService(QObject):
     计算密集型任务封装为 task，统一向 worker_manager 申请执行
     任务取消：request_cancel，task 尽快收尾工作，并触发信号
     任务完成/错误：在 handler 中断开连接与从 active_tasks 中移除
+    结果缓存：enable_cache 后，task.cache_key() 命中的请求直接发出 task_completed，不再执行
+    完成通道：use_completion_channel 为 True 时，task 不再通过 Qt 信号通知，
+        而是经 completion_channel 批量回到主线程，对外的信号不变
+    请求合并：task.dedup_key() 相同的请求只执行一次，结果分发给每个调用方；
+        取消按调用方计数，最后一个调用方取消时才真正终止执行
+    流式结果：StreamingTask 的部分结果经 results_streamed 逐块发出，槽函数返回后才允许 task 继续生产，
+        task_completed 的 result 为条目总数；流式任务不应定义 cache_key / dedup_key
     """
 
     task_started = Signal()
     progress_updated = Signal(int)
     task_completed = Signal(bool, object)  # success, result
     error_occurred = Signal(str)
+    results_streamed = Signal(object, object)  # task, list
+
+    # task 进度信号限流，子类或实例可覆盖
+    progress_max_rate = 20  # 每秒最多发出次数，None 表示不限频
+    progress_only_changed = True  # 仅在进度值变化时发出
+
+    use_completion_channel = False  # 高频小任务可开启
 
     def __init__(self, name):
         super().__init__()
@@ -25,32 +44,75 @@ class BaseService(QObject):
         # QThreadPool 执行完 QRunnable task 就会直接销毁
         # 所以在 BaseTask 中需要 setAutoDelete(False)
         self.active_tasks = []
+        self.result_cache = None
+
+        # 请求合并：执行中的 task 即为该 dedup 键的执行者，等待者中可能包括它自己
+        self._inflight = {}  # dedup 键 -> 执行者
+        self._waiters = {}  # 执行者 -> 等待结果的 task 列表
+        self._flight_of = {}  # 等待者 -> 执行者
+
+    def enable_cache(self, max_entries=256, ttl=None, max_bytes=None):
+        """启用结果缓存，参数见 ResultCache"""
+        self.result_cache = ResultCache(max_entries, ttl, max_bytes)
+
+    def invalidate_cache(self, key=None):
+        """key 为空时清空全部缓存"""
+        if self.result_cache is None:
+            return
+        if key is None:
+            self.result_cache.clear()
+        else:
+            self.result_cache.invalidate(key)
+
+    def has_capacity(self, count=1):
+        """worker 队列是否还能接收 count 个任务，生产速度快于消费时可据此暂停提交"""
+        capacity = worker_manager.capacity()
+        return capacity is None or capacity >= count
+
+    def deliver(self, task: BaseTask, priority=None):
+        """将 task 交付给 worker 执行，priority 为空时使用 task 自身的优先级"""
+        if self._complete_from_cache(task) or self._join_flight(task):
+            return
 
-    def deliver(self, task: BaseTask):
-        """将 task 交付给 worker 执行"""
         self.active_tasks.append(task)
+        task.set_progress_limits(self.progress_max_rate, self.progress_only_changed)
 
-        task.started.connect(self.on_task_started)
-        task.progress.connect(self.on_progress_updated)
-        # task 运行完毕后 会自动通知 controller
-        task.finished.connect(self.on_task_finished)
-        task.error.connect(self.on_task_error)
+        if self.use_completion_channel:
+            task.sink = self
+        else:
+            task.started.connect(self.on_task_started)
+            task.progress.connect(self.on_progress_updated)
+            # task 运行完毕后 会自动通知 controller
+            task.finished.connect(self.on_task_finished)
+            task.error.connect(self.on_task_error)
+            if isinstance(task, StreamingTask):
+                task.streamed.connect(self.on_results_streamed)
 
-        worker_manager.execute(task)
+        # 队列满被拒绝时 task 会发出 error，由 on_task_error 清理
+        worker_manager.execute(task, owner=self.name, priority=priority)
 
     def cancel_task(self, task: BaseTask):
         """终止任务并断连"""
-        if task not in self.active_tasks or not task.is_running:
+        if task not in self.active_tasks:
             logger.error(f"{self}: cancelling unactivated task {task}")
             return
 
-        task.request_cancel()
+        runner = self._flight_of.get(task)
+        if runner is not None:
+            if not self._leave_flight(task, runner):
+                return
+            # 已没有调用方等待结果，真正终止执行
+            task = runner
+
+        self._cancel_execution(task)
 
     def cancel_all(self):
         """终止所有任务"""
         # 小列表副本的开销可以接受，且避免了迭代器失效
         for task in list(self.active_tasks):
-            self.cancel_task(task)
+            # 取消批任务时其子任务会一并移除
+            if task in self.active_tasks:
+                self.cancel_task(task)
 
     # signal
     def on_task_started(self):
@@ -59,22 +121,121 @@ class BaseService(QObject):
     def on_progress_updated(self, new_progress: int):
         self.progress_updated.emit(new_progress)
 
+    def on_results_streamed(self, task, items):
+        self.results_streamed.emit(task, items)
+        task.ack_chunk()
+
     def on_task_finished(self, task, success, result):
         """处理任务完成"""
         self._disconnect_and_remove_task(task)
-        self.task_completed.emit(success, result)
+        self._complete(task, success, result)
 
     def on_task_error(self, task, message):
         """处理任务错误"""
         logger.info(f"{task} error: {message}")
 
         self._disconnect_and_remove_task(task)
-        self.error_occurred.emit(message)
+        self._fail(task, message)
 
     # helpers
+    def _cancel_execution(self, task):
+        if worker_manager.cancel(task):
+            # 仍在排队，直接按取消完成处理
+            self.on_task_finished(task, False, None)
+            return
+
+        task.request_cancel()
+
+    def _complete(self, task, success, result):
+        """缓存结果并通知所有等待该结果的调用方"""
+        if success and result is not None and self.result_cache is not None:
+            key = task.cache_key()
+            if key is not None:
+                self.result_cache.put(key, result)
+
+        for waiter in self._finish_flight(task):
+            self.task_completed.emit(success, result)
+
+    def _fail(self, task, message):
+        for waiter in self._finish_flight(task):
+            self.error_occurred.emit(message)
+
+    def _join_flight(self, task):
+        """相同 dedup 键的任务正在执行时挂到其上，返回是否已挂上"""
+        key = task.dedup_key()
+        if key is None:
+            return False
+
+        runner = self._inflight.get(key)
+        if runner is None:
+            # 成为该键的执行者
+            self._inflight[key] = task
+            self._waiters[task] = [task]
+            self._flight_of[task] = task
+            return False
+
+        logger.debug(f"{task} joined in-flight {runner}")
+        self._waiters[runner].append(task)
+        self._flight_of[task] = runner
+        self.active_tasks.append(task)
+        return True
+
+    def _leave_flight(self, task, runner):
+        """调用方退出等待，返回是否已没有其他调用方等待"""
+        waiters = self._waiters[runner]
+        waiters.remove(task)
+        del self._flight_of[task]
+        # 执行者仍在运行，需等其结束后再移除
+        if task is not runner:
+            self.active_tasks.remove(task)
+
+        self.task_completed.emit(False, None)
+        if waiters:
+            return False
+        # 执行者即将被取消，之后相同 dedup 键的请求应重新执行，而不是挂到它上面
+        self._drop_inflight(runner)
+        return True
+
+    def _finish_flight(self, task):
+        """结束请求合并，返回需要通知的等待者"""
+        waiters = self._waiters.pop(task, None)
+        if waiters is None:
+            return [task]
+
+        self._drop_inflight(task)
+        for waiter in waiters:
+            del self._flight_of[waiter]
+            if waiter is not task:
+                self.active_tasks.remove(waiter)
+        return waiters
+
+    def _drop_inflight(self, runner):
+        """键可能已被 _leave_flight 移除，或已属于新的执行者"""
+        key = runner.dedup_key()
+        if self._inflight.get(key) is runner:
+            del self._inflight[key]
+
+    def _complete_from_cache(self, task):
+        """缓存命中时直接完成，不经过 worker_manager"""
+        if self.result_cache is None:
+            return False
+
+        key = task.cache_key()
+        if key is None:
+            return False
+
+        hit, result = self.result_cache.get(key)
+        if hit:
+            logger.debug(f"{task} cache hit")
+            self.task_completed.emit(True, result)
+        return hit
+
     def _disconnect_and_remove_task(self, task):
-        task.finished.disconnect(self.on_task_finished)
-        task.error.disconnect(self.on_task_error)
+        if task.sink is None:
+            task.finished.disconnect(self.on_task_finished)
+            task.error.disconnect(self.on_task_error)
+            if isinstance(task, StreamingTask):
+                task.streamed.disconnect(self.on_results_streamed)
         self.active_tasks.remove(task)
 
     def __str__(self):
@@ -83,13 +244,19 @@ class BaseService(QObject):
 
 class BatchedService(BaseService):
     """
-    批量任务服务，将多个任务打包成一个任务
-    任务取消：request_cancel，task 尽快收尾工作，并触发信号
-    任务完成/错误：在 handler 中断开连接与从 active_tasks 中移除
+    批量任务服务，将多个任务打包成一个 BatchTask，整批只调度一次
+    任务取消：排队中的任务直接移除；已交付的任务 request_cancel，execute_batch 跳过
+    任务完成/错误：BatchTask 完成后按子任务拆分结果，逐个发出 task_completed / error_occurred
+    自适应：传入 AdaptiveBatchController 时，载荷与交付间隔由实测耗时决定，忽略 interval 与 max_load
+    task.batchable 为 False 的任务不入批，按 BaseService 的方式单独交付
     """
 
-    def __init__(self, name, interval, max_load):
+    def __init__(self, name, interval, max_load, adaptive: AdaptiveBatchController = None):
         super().__init__(name)
+        self.adaptive = adaptive
+        if adaptive:
+            interval = adaptive.interval
+            max_load = adaptive.target_latency
         self.timeout_timer = TimeoutTimer(interval, self._do_deliver)
 
         # 大于 max_load 或定时器触发，则立即交付
@@ -97,36 +264,126 @@ class BatchedService(BaseService):
         self.max_load = max_load
 
         self.task_queue = []
+        self._charged = {}  # 排队中的 task -> 入队时计入的载荷，自适应估计会变化，撤销时按原值扣除
 
     def load_size(self, task):
-        """评估任务载荷，子类应重写此方法，重写一般基于 max_load"""
+        """评估任务载荷，未启用自适应时子类应重写此方法，重写一般基于 max_load"""
+        if self.adaptive:
+            return self.adaptive.estimate(task)
         raise NotImplementedError("子类必须实现 load_point 方法")
 
-    def deliver(self, task: BaseTask):
+    def deliver(self, task: BaseTask, priority=None):
+        if not task.batchable:
+            super().deliver(task, priority)
+            return
+        if self._complete_from_cache(task) or self._join_flight(task):
+            return
+
+        if priority is not None:
+            task.priority = priority
         self._enqueue(task)
         if self.current_load >= self.max_load:
             self._do_deliver()
 
+    def execute_batch(self, tasks, batch: BatchTask):
+        """
+        在 worker 线程中执行整批任务，子类可重写以共享资源（如同一密码的密钥）
+        单个子任务的异常不影响其余子任务
+        """
+        results = []
+        total = len(tasks)
+        for i, task in enumerate(tasks):
+            if task._is_canceled:
+                results.append((task, False, None, None))
+                continue
+
+            try:
+                start = time.perf_counter()
+                task.started_at = time.monotonic()
+                result = profiler.run(task) if profiler.enabled else task.execute()
+                if self.adaptive:
+                    self.adaptive.observe(task, (time.perf_counter() - start) * 1000)
+                results.append((task, not task._is_canceled, result, None))
+            except TaskDeadlineExceeded:
+                results.append((task, False, None, f"任务超时: 超过 {task.deadline} 秒"))
+            except TaskCancelled:
+                results.append((task, False, None, None))
+            except Exception as e:
+                logger.error(f"{task} 执行失败，出现异常：{str(e)}")
+                results.append((task, False, None, f"任务失败: {str(e)}"))
+
+            batch.report_progress(int((i + 1) / total * 100))
+        return results
+
+    # helpers
+    def _cancel_execution(self, task):
+        if task in self.task_queue:
+            self.task_queue.remove(task)
+            self.current_load -= self._charged.pop(task)
+            self.active_tasks.remove(task)
+            self._complete(task, False, None)
+            return
+
+        super()._cancel_execution(task)
+
+    # signal
+    def on_task_finished(self, task, success, result):
+        """拆分批任务结果"""
+        if not isinstance(task, BatchTask):
+            super().on_task_finished(task, success, result)
+            return
+        self._disconnect_and_remove_task(task)
+
+        if result is None:
+            # 整批在排队时被取消
+            result = [(sub_task, False, None, None) for sub_task in task.tasks]
+
+        for sub_task, sub_success, sub_result, message in result:
+            self.active_tasks.remove(sub_task)
+            if message is None:
+                self._complete(sub_task, sub_success, sub_result)
+            else:
+                self._fail(sub_task, message)
+
+    def on_task_error(self, task, message):
+        """execute_batch 自身出错，整批失败"""
+        if not isinstance(task, BatchTask):
+            super().on_task_error(task, message)
+            return
+        logger.info(f"{task} error: {message}")
+
+        self._disconnect_and_remove_task(task)
+        for sub_task in task.tasks:
+            self.active_tasks.remove(sub_task)
+            self._fail(sub_task, message)
+
     def _do_deliver(self):
+        if self.adaptive:
+            self._adapt_interval()
         if not self.task_queue:
             return
         self.timeout_timer.stop()
 
-        self.active_tasks.extend(self.task_queue)
-        for task in self.task_queue:
-            super().deliver(task)
-        self.batch_size = 0
-        self.task_queue.clear()
+        tasks, self.task_queue = self.task_queue, []
+        self.current_load = 0
+        self._charged.clear()
+
+        batch = BatchTask(f"{self.name}Batch[{len(tasks)}]", tasks, self.execute_batch)
+        # 整批按其中最高的优先级调度
+        super().deliver(batch, max(task.priority for task in tasks))
 
         self.timeout_timer.start()
 
+    def _adapt_interval(self):
+        """线程池有排队即视为繁忙"""
+        busy = worker_manager.thread_pending_count() > 0
+        self.timeout_timer.set_interval(self.adaptive.next_interval(busy))
+
     def _enqueue(self, task):
-        """评估载荷并入队"""
-        self.current_load += self.load_size(task)
+        """评估载荷并入队，子任务不单独连接信号"""
+        load = self.load_size(task)
+        self._charged[task] = load
+        self.current_load += load
         self.task_queue.append(task)
-
-        task.started.connect(self.on_task_started)
-        task.progress.connect(self.on_progress_updated)
-        # task 运行完毕后 会自动通知 controller
-        task.finished.connect(self.on_task_finished)
-        task.error.connect(self.on_task_error)
+        self.active_tasks.append(task)
+        task.owner = self.name
@@ -1,15 +1,39 @@
 import asyncio
+import threading
+import time
 from typing import Any
 
 from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
 from core.utils.logger import logger
+from core.utils.metrics import metrics
+from core.utils.profiler import profiler
+from core.worker.completion_channel import completion_channel
+
+
+class TaskPriority:
+    """任务优先级，数值越大越先执行，可使用任意整数"""
+    LOW = -10  # 批量、后台任务
+    NORMAL = 0
+    HIGH = 10  # 用户交互触发、需要尽快响应的任务
+
+
+class TaskCancelled(Exception):
+    """check_cancelled 检查到取消请求时抛出，run 按取消完成处理"""
+
+
+class TaskDeadlineExceeded(TaskCancelled):
+    """check_cancelled 检查到已超过 deadline 时抛出，run 按错误处理"""
 
 
 class BaseTask(QObject, QRunnable):
     """
     任务实体基类，运行在独立线程中
-    子类需要使用 progress 汇报进度、实现 execute 接口
+    子类需要使用 report_progress 汇报进度、实现 execute 接口
+    report_progress 按 service 设置的频率限流，逐项汇报进度也不会产生海量跨线程信号
     子类中出现的异常，要么自行处理+logger，要么 raise 异常
+    通知 service：默认使用 Qt 信号；sink 不为空时改走 completion_channel，直接调用 sink 的同名处理函数，不再发出信号
+    deadline：运行时间上限（秒），长循环中应调用 check_cancelled，超时或被取消时抛出异常结束任务
+        不检查的任务由 worker_manager 的 watchdog 上报，超时过久可被隔离，不再占用线程池名额
     """
 
     started = Signal()
@@ -17,7 +41,11 @@ class BaseTask(QObject, QRunnable):
     finished = Signal(object, bool, object)  # (task, success, result)
     error = Signal(object, str)  # task, message
 
-    def __init__(self, name):
+    priority = TaskPriority.NORMAL  # 子类可覆盖，deliver 时也可指定
+    process_safe = False  # 为 True 时由 worker_manager 交给进程池执行，见 ProcessTask
+    batchable = True  # 为 False 时 BatchedService 单独交付，不与其他任务合批（长任务、需要单独进度的任务）
+
+    def __init__(self, name, deadline=None):
         # 多继承需要手动调用，因为Qt是C++实现的
         QObject.__init__(self)
         QRunnable.__init__(self)
@@ -32,22 +60,66 @@ class BaseTask(QObject, QRunnable):
         self.is_running = False
         self._is_canceled = False
 
+        self.deadline = deadline
+        self.submitted_at = None  # 由 worker_manager 设置，用于统计排队时间
+        self.started_at = None
+        # 运行结束与 watchdog 隔离可能同时发生，只有先到者发出结束信号
+        self._settle_lock = threading.Lock()
+        self._settled = False
+        self.quarantined = False
+
+        self.sink = None  # 使用 completion_channel 时接收通知的 service
+        self.owner = None  # 所属 service 名，由 worker_manager 设置
+        self.done_hook = None  # 运行结束后在 worker 线程中回调，用于调度下一个任务
+
+        # 进度限流，由 service 在 deliver 时设置
+        self._progress_interval = 0  # 两次发出的最小间隔（秒），0 表示不限频
+        self._progress_only_changed = True
+        self._last_progress = None
+        self._last_progress_time = 0.0
+        self._pending_progress = None  # 被限流、尚未发出的最新值
+
     def run(self):
         """任务执行入口"""
         try:
             logger.info(f"{self.name} 开始执行")
+            self.mark_started()
             self.is_running = True
-            self.started.emit()
-            result = self.execute()
+            self.emit_started()
+            result = self._invoke()
             self.is_running = False
+            self.flush_progress()
 
             success = not self._is_canceled
             logger.info(f"{self.name} 执行完毕")
-            self.finished.emit(self, success, result)
+            self.record_outcome("success" if success else "cancel")
+            if self.settle():
+                self.emit_finished(success, result)
+
+        except TaskDeadlineExceeded:
+            self.is_running = False
+            logger.error(f"{self.name} 超过 deadline {self.deadline}s")
+            self.record_outcome("error")
+            if self.settle():
+                self.emit_error(f"任务超时: 超过 {self.deadline} 秒")
+
+        except TaskCancelled:
+            self.is_running = False
+            logger.info(f"{self.name} 已取消")
+            self.record_outcome("cancel")
+            if self.settle():
+                self.emit_finished(False, None)
 
         except Exception as e:
+            self.is_running = False
             logger.error(f"{self.name} 执行失败，出现异常：{str(e)}")
-            self.error.emit(self, f"任务失败: {str(e)}")
+            self.record_outcome("error")
+            if self.settle():
+                self.emit_error(f"任务失败: {str(e)}")
+
+        finally:
+            if self.done_hook:
+                self.done_hook(self)
 
     def execute(self):
         """
@@ -57,32 +129,290 @@ class BaseTask(QObject, QRunnable):
         """
         raise NotImplementedError("子类必须实现execute方法")
 
+    def _invoke(self):
+        """调用 execute，子类可在此对结果做后处理"""
+        return profiler.run(self) if profiler.enabled else self.execute()
+
     def request_cancel(self):
         """终止执行，仅设置状态"""
         logger.debug(f"{self.name} requested cancel")
         self._is_canceled = True
 
+    def check_cancelled(self):
+        """取消检查点，在 execute 的循环中调用"""
+        if self.overran():
+            raise TaskDeadlineExceeded(self.name)
+        if self._is_canceled:
+            raise TaskCancelled(self.name)
+
+    def overran(self):
+        """是否已超过 deadline"""
+        if self.deadline is None or self.started_at is None:
+            return False
+        return time.monotonic() - self.started_at > self.deadline
+
+    def mark_started(self):
+        """记录开始时间与排队时间"""
+        self.started_at = time.monotonic()
+        if self.submitted_at is not None:
+            metrics.observe("task_wait_seconds", self.started_at - self.submitted_at, **self._metric_labels())
+
+    def record_outcome(self, outcome):
+        """记录执行时间与结果：success / cancel / error / quarantine，被隔离的任务之后的结果不再记录"""
+        if self.quarantined and outcome != "quarantine":
+            return
+        labels = self._metric_labels()
+        if self.started_at is not None:
+            metrics.observe("task_run_seconds", time.monotonic() - self.started_at, **labels)
+        metrics.inc("task_total", outcome=outcome, **labels)
+
+    def _metric_labels(self):
+        # 使用类名而不是 name，避免 name 中的动态内容导致标签过多
+        return {"task": type(self).__name__, "service": self.owner or ""}
+
+    def settle(self):
+        """标记任务已结束，只有第一次调用返回 True，之后的结束信号应丢弃"""
+        with self._settle_lock:
+            if self._settled:
+                return False
+            self._settled = True
+            return True
+
+    def cache_key(self):
+        """结果缓存键，相同键的任务结果相同；返回 None 表示不可缓存"""
+        return None
+
+    def dedup_key(self):
+        """请求合并键，相同键的任务同时只执行一个；返回 None 表示不合并"""
+        return None
+
+    def set_progress_limits(self, max_rate=None, only_changed=True):
+        """max_rate: 每秒最多发出的进度信号数，None 表示不限频"""
+        self._progress_interval = 1 / max_rate if max_rate else 0
+        self._progress_only_changed = only_changed
+
+    def report_progress(self, value: int):
+        """限流后发出 progress 信号，被丢弃的最新值在任务结束前由 flush_progress 补发"""
+        if self._progress_only_changed and value == self._last_progress:
+            return
+
+        now = time.monotonic()
+        if now - self._last_progress_time < self._progress_interval:
+            self._pending_progress = value
+            return
+
+        self._emit_progress(value, now)
+
+    def flush_progress(self):
+        """发出被限流的最终进度"""
+        value = self._pending_progress
+        if value is not None and value != self._last_progress:
+            self._emit_progress(value, time.monotonic())
+        self._pending_progress = None
+
+    def _emit_progress(self, value, now):
+        self._last_progress = value
+        self._last_progress_time = now
+        self._pending_progress = None
+        self._notify(self.progress, "on_progress_updated", value)
+
+    # 通知
+    def emit_started(self):
+        self._notify(self.started, "on_task_started")
+
+    def emit_finished(self, success, result):
+        self._notify(self.finished, "on_task_finished", self, success, result)
+
+    def emit_error(self, message):
+        self._notify(self.error, "on_task_error", self, message)
+
+    def _notify(self, signal, handler_name, *args):
+        if self.sink is None:
+            signal.emit(*args)
+        else:
+            completion_channel.push(getattr(self.sink, handler_name), *args)
+
     def __str__(self):
         return self.name
 
 
+class ProcessTask(BaseTask):
+    """
+    CPU 密集型任务，在子进程中执行以绕开 GIL
+    子类实现 get_state 与 execute_in_process：
+        get_state 返回可 pickle 的参数，运行在主进程
+        execute_in_process 运行在子进程，不能访问 self 与 Qt 对象，进度通过 report_progress 汇报
+    返回值同样需要可 pickle
+    """
+
+    process_safe = True
+    batchable = False
+
+    def get_state(self):
+        """返回传给 execute_in_process 的参数"""
+        raise NotImplementedError("子类必须实现get_state方法")
+
+    @staticmethod
+    def execute_in_process(state, report_progress):
+        raise NotImplementedError("子类必须实现execute_in_process方法")
+
+    def execute(self):
+        """不经过进程池时（如直接调用 run）在当前线程执行"""
+        return self.execute_in_process(self.get_state(), self.report_progress)
+
+
+class BatchTask(BaseTask):
+    """
+    将多个任务合并为一个 runnable 执行，只占用一次调度与一组信号连接
+    batch_executor(tasks, batch) 在 worker 线程中运行，
+    返回 [(task, success, result, error_message)]，由 service 拆分给各调用方
+    """
+
+    def __init__(self, name, tasks, batch_executor):
+        super().__init__(name)
+        self.tasks = tasks
+        self.batch_executor = batch_executor
+
+    def execute(self):
+        return self.batch_executor(self.tasks, self)
+
+    def _invoke(self):
+        """不整批 profile，由 batch_executor 按子任务类型分别 profile"""
+        return self.execute()
+
+    def request_cancel(self):
+        """整批取消，未执行的子任务不再执行"""
+        super().request_cancel()
+        for task in self.tasks:
+            task.request_cancel()
+
+
+class StreamingTask(BaseTask):
+    """
+    流式任务：子类将 execute 写成生成器，逐项 yield 结果
+    条目攒满 chunk_size 或距本块首个条目超过 chunk_interval 时打包，以 streamed(task, items) 发给 service，
+    首个条目立即发出以缩短首个结果的延迟；生产端迟迟不产出下一项时，由后台的 flusher 线程按时发出未满的块
+    背压：已发出但 service 尚未处理（ack_chunk）的块达到 max_pending_chunks 时生产端阻塞，
+        内存占用以 chunk_size * max_pending_chunks 为界；阻塞期间仍响应取消与 deadline
+    最终结果为发出的条目总数，不在批任务中使用
+    """
+
+    streamed = Signal(object, object)  # task, list
+
+    batchable = False
+    chunk_size = 256
+    chunk_interval = 0.1  # 秒
+    max_pending_chunks = 4
+
+    def __init__(self, name, deadline=None):
+        super().__init__(name, deadline)
+        self._chunk_slots = threading.Semaphore(self.max_pending_chunks)
+        self.streamed_count = 0
+
+        self._chunk_cond = threading.Condition()  # 保护 _chunk / _chunk_started / _stream_done
+        self._emit_lock = threading.Lock()  # 取块与发出一起进行，保证块的顺序
+        self._chunk = []
+        self._chunk_started = 0.0
+        self._stream_done = False
+
+    def ack_chunk(self):
+        """service 处理完一块后调用，释放一个在途名额"""
+        self._chunk_slots.release()
+
+    def _invoke(self):
+        # execute 只创建生成器，实际工作在迭代中，profile 整个消费过程
+        return profiler.run(self, self._stream) if profiler.enabled else self._stream()
+
+    def _stream(self):
+        items = self.execute()
+        flusher = threading.Thread(target=self._flush_when_due, name=f"{self.name}Flusher", daemon=True)
+        flusher.start()
+        try:
+            for item in items:
+                now = time.monotonic()
+                with self._chunk_cond:
+                    if not self._chunk:
+                        self._chunk_started = now
+                        self._chunk_cond.notify()
+                    self._chunk.append(item)
+                    due = (self.streamed_count == 0 or len(self._chunk) >= self.chunk_size
+                           or now - self._chunk_started >= self.chunk_interval)
+                if due:
+                    self._flush()
+            self._flush()
+        finally:
+            with self._chunk_cond:
+                self._stream_done = True
+                self._chunk_cond.notify()
+            # 等 flusher 发完手上的块，之后才能发出 finished
+            flusher.join()
+            items.close()
+        return self.streamed_count
+
+    def _flush(self):
+        with self._emit_lock:
+            with self._chunk_cond:
+                chunk, self._chunk = self._chunk, []
+            if chunk:
+                self._emit_chunk(chunk)
+
+    def _flush_when_due(self):
+        """flusher 线程：块中的首个条目等待超过 chunk_interval 时发出该块"""
+        while True:
+            with self._chunk_cond:
+                if self._stream_done:
+                    return
+                if not self._chunk:
+                    self._chunk_cond.wait()
+                    continue
+                remaining = self._chunk_started + self.chunk_interval - time.monotonic()
+                if remaining > 0:
+                    self._chunk_cond.wait(remaining)
+                    continue
+            try:
+                self._flush()
+            except (TaskCancelled, TaskDeadlineExceeded):
+                return  # 生产端会在下一次发出时收到同样的异常
+
+    def _emit_chunk(self, chunk):
+        while not self._chunk_slots.acquire(timeout=0.1):
+            self.check_cancelled()
+        self.check_cancelled()
+
+        labels = self._metric_labels()
+        if self.streamed_count == 0:
+            metrics.observe("task_first_chunk_seconds", time.monotonic() - self.started_at, **labels)
+        metrics.inc("task_streamed_items_total", len(chunk), **labels)
+        self.streamed_count += len(chunk)
+        self._notify(self.streamed, "on_results_streamed", self, chunk)
+
+
 class AsyncTask(BaseTask):
     """
     IO异步任务，通过 Qt 信号与 service 通信返回结果
+    stealable：短小、无状态的任务可由空闲的事件循环窃取执行；
+        持有绑定在某个事件循环上的资源（浏览器会话、连接等）的任务应设为 False
     """
 
-    def __init__(self, name, timeout=None):
+    stealable = True
+
+    def __init__(self, name, timeout=None, worker_index=None):
         super().__init__(name)
         self.timeout = timeout
         self.loop = None
+        # 有状态的任务（如浏览器会话）可固定在某个 IOWorker 上
+        self.worker_index = worker_index
+        self.handle = None  # 提交后由 IOWorkerManager 设置，见 TaskHandle
 
     async def execute(self):
         """子类实现此异步任务逻辑，可能多次进行 await 并最终 return"""
         raise NotImplementedError
 
     async def run(self):
+        """返回 execute 的结果；异常在发出 error 后继续抛出，由 TaskHandle 交给等待方"""
         try:
             logger.info(f"{self.name} 开始执行")
+            self.mark_started()
             self.is_running = True
             if self.timeout:
                 # await：注册调度，等待结果
@@ -90,10 +420,30 @@ class AsyncTask(BaseTask):
             else:
                 result = await self.execute()
             self.is_running = False
+            self.flush_progress()
 
             success = not self._is_canceled
             logger.info(f"{self.name} 执行完毕")
-            self.finished.emit(self, success, result)
+            self.record_outcome("success" if success else "cancel")
+            if self.settle():
+                self.emit_finished(success, result)
+            return result
+        except asyncio.CancelledError:
+            # CancelledError 不是 Exception 的子类，必须单独处理，否则 service 收不到结束通知
+            self.is_running = False
+            logger.info(f"{self.name} 已取消")
+            self.record_outcome("cancel")
+            if self.settle():
+                self.emit_finished(False, None)
+            raise
         except Exception as e:
+            self.is_running = False
             logger.error(f"{self.name} 执行失败，出现异常：{str(e)}")
-            self.error.emit(self, f"任务失败: {str(e)}")
+            self.record_outcome("error")
+            if self.settle():
+                self.emit_error(f"任务失败: {str(e)}")
+            raise
+        finally:
+            # 在事件循环线程中回调，此时协程已真正结束（包括被取消后的收尾）
+            if self.done_hook:
+                self.done_hook(self)
@@ -0,0 +1,51 @@
+import threading
+
+
+class AdaptiveBatchController:
+    """
+    BatchedService 的自适应批量控制
+    载荷单位为预估耗时（毫秒），按任务类型以 EWMA 学习单个任务的实际耗时：
+        批量大小：一批的预估耗时达到 target_latency 即交付
+        交付间隔：系统空闲时减半，尽快交付以降低延迟；线程池有排队时加倍，攒更大的批以提高吞吐
+    """
+
+    def __init__(self, target_latency=200, min_interval=1, max_interval=500,
+                 initial_cost=10, alpha=0.2):
+        """时间单位均为毫秒，initial_cost 为尚未观测到的任务类型的预估耗时"""
+        self.target_latency = target_latency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_cost = initial_cost
+        self.alpha = alpha
+
+        self.interval = min_interval
+        # observe 在 worker 线程调用，estimate 在主线程调用
+        self._lock = threading.Lock()
+        self._costs = {}  # 任务类型名 -> 单个任务耗时 EWMA
+
+    def estimate(self, task):
+        """预估单个任务耗时"""
+        with self._lock:
+            return self._costs.get(type(task).__name__, self.initial_cost)
+
+    def observe(self, task, elapsed):
+        """记录一次实际耗时"""
+        key = type(task).__name__
+        with self._lock:
+            cost = self._costs.get(key)
+            if cost is None:
+                self._costs[key] = elapsed
+            else:
+                self._costs[key] = self.alpha * elapsed + (1 - self.alpha) * cost
+
+    def next_interval(self, busy):
+        """根据系统负载计算下一次交付间隔"""
+        if busy:
+            self.interval = min(self.interval * 2, self.max_interval)
+        else:
+            self.interval = max(self.interval // 2, self.min_interval)
+        return self.interval
+
+    def costs(self):
+        with self._lock:
+            return dict(self._costs)
@@ -1,10 +1,14 @@
 # src/core/utils/logger.py
 import inspect
 import logging
+import multiprocessing
 import os
 from datetime import datetime
 from core.utils.config_manager import config
 
+# 进程池子进程会重新导入本模块，通过环境变量沿用主进程的日志文件
+LOG_FILE_ENV = "AZURCORE_LOG_FILE"
+
 
 class Logger:
     """一般集中在 task、controller、系统关键节点"""
@@ -21,10 +25,13 @@ class Logger:
 
     def init(self):
         """初始化 logger """
-        if config["log"]["clear_before"]:
+        is_main_process = multiprocessing.parent_process() is None
+        if config["log"]["clear_before"] and is_main_process:
             self._clear_log_dir()
 
         self.log_path = self._setup_logfile()
+        if is_main_process:
+            os.environ[LOG_FILE_ENV] = self.log_path
         self._restore_config()
         self._setup_log_handler()
 
@@ -55,6 +62,10 @@ class Logger:
 
     @staticmethod
     def _setup_logfile():
+        inherited = os.environ.get(LOG_FILE_ENV)
+        if inherited and multiprocessing.parent_process() is not None:
+            return inherited
+
         log_file = config["log"]["log_file"]
         if log_file and os.path.exists(log_file):
             return log_file
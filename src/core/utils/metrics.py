@@ -0,0 +1,235 @@
+"""
+任务遥测：计数器、直方图、仪表盘，供定位哪个插件占满了线程池/事件循环
+
+记录点：
+    task_wait_seconds：提交到开始执行的排队时间
+    task_run_seconds：执行时间
+    task_total{outcome}：success / cancel / error / quarantine 次数
+    以上均带 task（任务类名）与 service 标签；队列深度等由各 manager 注册为仪表盘
+导出：snapshot() 返回 dict，to_json / to_prometheus 输出文本，
+    MetricsExporter 定期写入本地文件或发送到 tcp://host:port
+"""
+
+import bisect
+import json
+import os
+import socket
+import threading
+import time
+
+from core.utils.logger import logger
+
+# 直方图桶上界（秒），100us ~ 约 100s，按 2 倍递增
+DEFAULT_BUCKETS = tuple(round(0.0001 * 2 ** i, 4) for i in range(21))
+
+
+class Histogram:
+    """固定桶直方图，分位数按桶内线性插值估计"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):
+        """p 取 0~100"""
+        if not self.count:
+            return None
+
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                value = lower + (upper - lower) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    """线程安全，worker 线程与主线程均可记录"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> int
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._gauges = {}  # (name, labels) -> 返回当前值的函数
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_gauge(self, name, func, **labels):
+        """导出时调用 func 获取当前值，如队列深度"""
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = func
+
+    def unregister_gauge(self, name, **labels):
+        with self._lock:
+            self._gauges.pop((name, _label_key(labels)), None)
+
+    def histogram(self, name, **labels):
+        with self._lock:
+            return self._histograms.get((name, _label_key(labels)))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, h.summary()) for key, h in self._histograms.items()]
+            gauges = list(self._gauges.items())
+
+        return {
+            "timestamp": time.time(),
+            "counters": [_entry(key, value=v) for key, v in counters],
+            "histograms": [_entry(key, **summary) for key, summary in histograms],
+            "gauges": [_entry(key, value=_read_gauge(func)) for key, func in gauges],
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式，同名序列归为一族，族前输出 # TYPE"""
+        lines = []
+        with self._lock:
+            for name, labels, value in _families(self._counters, lines, "counter"):
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name, labels, h in _families(self._histograms, lines, "histogram"):
+                cumulative = 0
+                for bound, n in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+
+            gauges = dict(self._gauges)
+
+        for name, labels, func in _families(gauges, lines, "gauge"):
+            lines.append(f"{name}{_format_labels(labels)} {_read_gauge(func)}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, target, fmt="json"):
+        """target 为文件路径或 tcp://host:port"""
+        text = self.to_prometheus() if fmt == "prometheus" else self.to_json()
+
+        if target.startswith("tcp://"):
+            host, port = target[len("tcp://"):].rsplit(":", 1)
+            with socket.create_connection((host, int(port)), timeout=5) as conn:
+                conn.sendall(text.encode())
+            return
+
+        # 先写临时文件再替换，读取方不会读到写了一半的文件
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        tmp_path = target + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, target)
+
+
+class MetricsExporter:
+    """守护线程中定期导出"""
+
+    def __init__(self, registry, target, fmt="json", interval=10):
+        self.registry = registry
+        self.target = target
+        self.fmt = fmt
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """停止并做最后一次导出"""
+        self._stop.set()
+        self._export()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._export()
+
+    def _export(self):
+        try:
+            self.registry.export(self.target, self.fmt)
+        except OSError as e:
+            # 导出失败不影响任务执行
+            logger.warning(f"导出 metrics 到 {self.target} 失败: {e}")
+
+
+# helpers
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _families(series, lines, kind):
+    """按名称分组产出 (name, labels, value)，每组之前向 lines 追加 # TYPE 行"""
+    by_name = {}
+    for (name, labels), value in series.items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    for name, members in by_name.items():
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in members:
+            yield name, labels, value
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+def _entry(key, **values):
+    name, labels = key
+    return {"name": name, "labels": dict(labels), **values}
+
+
+def _read_gauge(func):
+    try:
+        return func()
+    except Exception:
+        return None
+
+
+metrics = MetricsRegistry()
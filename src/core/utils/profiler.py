@@ -0,0 +1,99 @@
+import cProfile
+import os
+import pstats
+import random
+import threading
+
+from core.utils.config_manager import config
+from core.utils.logger import logger
+
+
+class TaskProfiler:
+    """
+    按任务类型或采样率对 BaseTask.execute 做 cProfile，按任务类型累积统计，
+    dump 时写入日志目录下的 profile_<任务类型>.pstats，可用 snakeviz 等工具查看
+    关闭时 BaseTask.run 只多一次属性判断
+    同一时刻只允许一个线程被 profile（Python 3.12 起 cProfile 全局只能启用一个），
+    其余线程的任务照常执行、不计入统计
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.task_types = set()
+        self.sample_rate = 0.0
+        self.output_dir = None
+
+        self._lock = threading.Lock()
+        self._active = threading.Lock()  # 当前是否有任务正在被 profile
+        self._stats = {}  # 任务类型名 -> pstats.Stats
+        self._runs = {}  # 任务类型名 -> 被 profile 的次数
+
+    def configure(self, enabled, task_types=(), sample_rate=0.0, output_dir=None):
+        """task_types 中的类型每次都 profile，其余任务按 sample_rate 抽样"""
+        self.task_types = set(task_types)
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir or os.path.dirname(logger.log_path)
+        self.enabled = enabled
+
+    def run(self, task, func=None):
+        """代替 task.execute() 调用；func 不为空时代替 execute，统计仍计入 task 的类型"""
+        func = func or task.execute
+        if not self._should_profile(task) or not self._active.acquire(blocking=False):
+            return func()
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                return func()
+            finally:
+                profile.disable()
+        finally:
+            self._active.release()
+            self._collect(type(task).__name__, profile)
+
+    def stats(self, task_type):
+        with self._lock:
+            return self._stats.get(task_type)
+
+    def dump(self):
+        """写出所有任务类型的累积统计"""
+        with self._lock:
+            items = list(self._stats.items())
+            runs = dict(self._runs)
+        if not items:
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        for task_type, stats in items:
+            path = os.path.join(self.output_dir, f"profile_{task_type}.pstats")
+            stats.dump_stats(path)
+            logger.info(f"{task_type} profile（{runs[task_type]} 次）已写入 {path}")
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._runs.clear()
+
+    # helpers
+    def _should_profile(self, task):
+        if type(task).__name__ in self.task_types:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _collect(self, task_type, profile):
+        with self._lock:
+            stats = self._stats.get(task_type)
+            if stats is None:
+                self._stats[task_type] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self._runs[task_type] = self._runs.get(task_type, 0) + 1
+
+
+profiler = TaskProfiler()
+profiler.configure(
+    config["profiling"]["enabled"],
+    config["profiling"]["task_types"],
+    config["profiling"]["sample_rate"],
+)
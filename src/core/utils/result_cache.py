@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    service 结果缓存：LRU + TTL + 内存预算
+    内存按 sys.getsizeof 估计（容器只计算外层），用于约束上限而非精确统计
+    """
+
+    def __init__(self, max_entries=256, ttl=None, max_bytes=None):
+        """ttl: 过期秒数，None 表示不过期；max_bytes: 内存预算，None 表示不限制"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (result, expire_at, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """返回 (是否命中, 结果)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            result, expire_at, _ = entry
+            if expire_at is not None and expire_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, result
+
+    def put(self, key, result):
+        size = sys.getsizeof(result)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expire_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, expire_at, size)
+            self._bytes += size
+            self._evict()
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # helpers
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        """淘汰最久未使用的条目直到满足数量与内存限制"""
+        while len(self._entries) > self.max_entries or \
+                (self.max_bytes is not None and self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+
+from core.utils.config_manager import config
+from core.utils.logger import logger
+
+
+class TaskJournal:
+    """
+    批量任务的追加式日志（JSONL），记录每个条目的完成情况，程序中断后可从断点继续
+    每行一条记录：
+        {"job": id, "op": "begin", "meta": {...}}   meta 为恢复任务所需的参数
+        {"job": id, "op": "item", "item": key, "data": ...}
+        {"job": id, "op": "end"}                    正常结束、取消或出错，不再恢复
+    写入按批 fsync：累计 fsync_every 条或距上次超过 fsync_interval 秒时落盘，
+        崩溃最多丢失最后一批记录，这些条目恢复时会重新执行，因此条目操作应可重复
+    已结束任务的记录超过 compact_threshold 条时重写文件，只保留未结束的任务
+    末尾不完整的行（写入中途崩溃）在加载时截掉
+    """
+
+    def __init__(self, path, fsync_every=64, fsync_interval=0.5, compact_threshold=10000):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+
+        self._lock = threading.Lock()
+        self._file = None  # 首次使用时打开
+        self._jobs = {}  # job -> {"meta": ..., "items": {item: data}}
+        self._dead = 0  # 文件中已结束任务的记录数
+        self._unsynced = 0
+        self._last_sync = 0.0
+
+    def begin(self, job, meta=None):
+        with self._lock:
+            self._open()
+            self._jobs[job] = {"meta": meta, "items": {}}
+            self._append({"job": job, "op": "begin", "meta": meta}, force_sync=True)
+
+    def record(self, job, item, data=None):
+        """记录条目 item 已完成，data 为恢复时需要的附加信息（需可 JSON 序列化）"""
+        with self._lock:
+            self._open()
+            self._jobs[job]["items"][item] = data
+            self._append({"job": job, "op": "item", "item": item, "data": data})
+
+    def end(self, job):
+        with self._lock:
+            self._open()
+            state = self._jobs.pop(job, None)
+            if state is None:
+                return
+            self._dead += len(state["items"]) + 2
+            self._append({"job": job, "op": "end"}, force_sync=True)
+            if self._dead > self.compact_threshold:
+                self._compact()
+
+    def completed(self, job):
+        """job 已完成的条目 {item: data}"""
+        with self._lock:
+            self._open()
+            state = self._jobs.get(job)
+            return dict(state["items"]) if state else {}
+
+    def unfinished(self):
+        """未结束的任务 {job: meta}，用于程序启动时恢复"""
+        with self._lock:
+            self._open()
+            return {job: state["meta"] for job, state in self._jobs.items()}
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def compact(self):
+        with self._lock:
+            self._open()
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    # helpers
+    def _open(self):
+        if self._file is not None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._last_sync = time.monotonic()
+        if self._dead > self.compact_threshold:
+            self._compact()
+
+    def _load(self):
+        self._jobs.clear()
+        self._dead = 0
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if data and not data.endswith(b"\n"):
+            # 截掉写入中途崩溃留下的半行，否则之后追加的记录会接在它后面
+            with open(self.path, "r+b") as f:
+                f.truncate(data.rfind(b"\n") + 1)
+
+        for line in data.decode("utf-8", errors="replace").splitlines(keepends=True):
+            if not line.endswith("\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"忽略损坏的日志记录: {line[:80]!r}")
+                continue
+
+            job, op = entry["job"], entry["op"]
+            if op == "begin":
+                self._jobs[job] = {"meta": entry.get("meta"), "items": {}}
+            elif job not in self._jobs:
+                self._dead += 1
+            elif op == "item":
+                self._jobs[job]["items"][entry["item"]] = entry.get("data")
+            elif op == "end":
+                self._dead += len(self._jobs.pop(job)["items"]) + 2
+        logger.info(f"{self.path}: {len(self._jobs)} 个未结束的任务")
+
+    def _append(self, entry, force_sync=False):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+        if (force_sync or self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _compact(self):
+        """写入临时文件后原子替换"""
+        self._sync()
+        self._file.close()
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for job, state in self._jobs.items():
+                f.write(json.dumps({"job": job, "op": "begin", "meta": state["meta"]}, ensure_ascii=False) + "\n")
+                for item, data in state["items"].items():
+                    f.write(json.dumps({"job": job, "op": "item", "item": item, "data": data}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        logger.debug(f"{self.path} 已压缩，丢弃 {self._dead} 条已结束任务的记录")
+        self._dead = 0
+        self._file = open(self.path, "a", encoding="utf-8")
+
+
+task_journal = TaskJournal(
+    config["journal"]["path"],
+    config["journal"]["fsync_every"],
+    config["journal"]["fsync_interval"],
+    config["journal"]["compact_threshold"],
+)
@@ -1,3 +1,5 @@
+import time
+
 from PySide6.QtCore import QTimer
 
 
@@ -19,6 +21,34 @@ class TimeoutTimer:
     def start(self):
         self._timer.start()
 
+    def set_interval(self, interval: int):
+        self._timer.setInterval(interval)
+
+
+def benchmark_iterations(func, iterations=1000, warmup=10):
+    """重复调用 func，返回单次调用耗时统计（秒）"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    return summarize(samples)
+
 
-def benchmark_iterations(func):
-    pass
\ No newline at end of file
+def summarize(samples):
+    """耗时样本（秒）的统计"""
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        "iterations": n,
+        "mean": sum(samples) / n,
+        "min": samples[0],
+        "p50": samples[n // 2],
+        "p90": samples[min(n - 1, int(n * 0.9))],
+        "p99": samples[min(n - 1, int(n * 0.99))],
+        "max": samples[-1],
+    }
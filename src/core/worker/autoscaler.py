@@ -0,0 +1,127 @@
+import os
+
+from core.utils.logger import logger
+from core.utils.timeout_timer import TimeoutTimer
+
+
+_OPTIONS = (
+    "interval", "min_threads", "max_threads", "min_io_workers", "max_io_workers",
+    "high_utilization", "low_utilization", "idle_rounds", "busy_rounds",
+)
+
+
+class PoolAutoscaler:
+    """
+    按负载在上下限之间伸缩 worker_manager 的线程数与 io_worker_manager 的事件循环数，在主线程定时运行
+    线程池：有任务排队且线程全忙时扩容，排队深度越大一次扩得越多；
+        连续 idle_rounds 轮利用率低于 low_utilization 且无排队时缩容 1 个，
+        多出的空闲线程在 thread_expiry 秒后由线程池回收
+    事件循环：连续 busy_rounds 轮平均繁忙比例高于 high_utilization 或 ready 队列中有协程等待时扩容 1 个，
+        一轮之内就被窃取走的短暂排队不会触发扩容；
+        连续 idle_rounds 轮繁忙比例低于 low_utilization 且无等待时退役 1 个
+    上限为 None 时按 CPU 核心数确定；configure 可在运行时修改任意参数
+    """
+
+    def __init__(self, worker_manager, io_worker_manager, interval=2.0,
+                 min_threads=2, max_threads=None, min_io_workers=1, max_io_workers=None,
+                 high_utilization=0.7, low_utilization=0.2, idle_rounds=5, thread_expiry=30, busy_rounds=3):
+        self.worker_manager = worker_manager
+        self.io_worker_manager = io_worker_manager
+        self.interval = interval
+        self.min_threads = min_threads
+        self.max_threads = max_threads
+        self.min_io_workers = min_io_workers
+        self.max_io_workers = max_io_workers
+        self.high_utilization = high_utilization
+        self.low_utilization = low_utilization
+        self.idle_rounds = idle_rounds
+        self.busy_rounds = busy_rounds
+
+        self._thread_idle = 0
+        self._io_idle = 0
+        self._io_busy = 0
+        self._timer = None
+        worker_manager.set_thread_expiry(thread_expiry)
+
+    def configure(self, **options):
+        """运行时修改参数，如 configure(max_threads=8, interval=1.0)"""
+        for name, value in options.items():
+            if name == "thread_expiry":
+                self.worker_manager.set_thread_expiry(value)
+                continue
+            if name not in _OPTIONS:
+                raise ValueError(f"未知的伸缩参数: {name}")
+            setattr(self, name, value)
+
+        if self._timer and "interval" in options:
+            self._timer.set_interval(int(self.interval * 1000))
+        # 上下限变化后立即生效
+        self.step()
+
+    def start(self):
+        if self._timer is None:
+            self._timer = TimeoutTimer(int(self.interval * 1000), self.step)
+
+    def stop(self):
+        if self._timer:
+            self._timer.stop()
+            self._timer = None
+
+    def step(self):
+        """执行一次伸缩判断"""
+        self._scale_threads()
+        self._scale_io_workers()
+
+    # helpers
+    def _scale_threads(self):
+        cpu_count = os.cpu_count() or 1
+        upper = self.max_threads or cpu_count
+        current = self.worker_manager.max_concurrent
+        pending = self.worker_manager.thread_pending_count()
+        utilization = self.worker_manager.utilization()
+
+        target = current
+        if pending and utilization >= 1.0:
+            # 线程全忙且有排队：按排队深度扩容，每轮最多翻倍
+            target = current + min(pending, current)
+            self._thread_idle = 0
+        elif not pending and utilization < self.low_utilization:
+            self._thread_idle += 1
+            if self._thread_idle >= self.idle_rounds:
+                target = current - 1
+                self._thread_idle = 0
+        else:
+            self._thread_idle = 0
+
+        target = max(self.min_threads, min(upper, target))
+        if target != current:
+            logger.debug(f"线程池伸缩 {current} -> {target}（排队 {pending}，利用率 {utilization:.2f}）")
+            self.worker_manager.resize(target)
+
+    def _scale_io_workers(self):
+        upper = self.max_io_workers or os.cpu_count() or 1
+        current = len(self.io_worker_manager.workers)
+        queued = self.io_worker_manager.queued_count()
+        utilization = self.io_worker_manager.utilization()
+
+        target = current
+        if queued or utilization > self.high_utilization:
+            self._io_busy += 1
+            self._io_idle = 0
+            if self._io_busy >= self.busy_rounds:
+                target = current + 1
+                self._io_busy = 0
+        elif utilization < self.low_utilization:
+            self._io_busy = 0
+            self._io_idle += 1
+            if self._io_idle >= self.idle_rounds:
+                target = current - 1
+                self._io_idle = 0
+        else:
+            self._io_busy = 0
+            self._io_idle = 0
+
+        target = max(self.min_io_workers, min(upper, target))
+        if target != current:
+            logger.debug(f"IOWorker 伸缩 {current} -> {target}（等待 {queued}，繁忙比例 {utilization:.2f}）")
+            self.io_worker_manager.resize(target)
@@ -0,0 +1,42 @@
+"""
+队列满时的处理策略，WorkerManager 与 IOWorkerManager 共用
+
+    block：阻塞提交方直到有空位，超时后按 reject 处理；在主线程提交时会卡住界面，慎用
+    reject：拒绝新任务，task 发出 error
+    drop_oldest：丢弃最早提交的任务，被丢弃的 task 发出 error
+    shed_priority：丢弃优先级最低的任务；新任务优先级不高于它时拒绝新任务
+"""
+
+
+class OverflowPolicy:
+    BLOCK = "block"
+    REJECT = "reject"
+    DROP_OLDEST = "drop_oldest"
+    SHED_PRIORITY = "shed_priority"
+
+    ALL = (BLOCK, REJECT, DROP_OLDEST, SHED_PRIORITY)
+
+
+def validate_policy(policy):
+    if policy not in OverflowPolicy.ALL:
+        raise ValueError(f"未知的队列溢出策略: {policy}")
+    return policy
+
+
+def choose_victim(policy, candidates, new_task):
+    """
+    从 candidates 中选出需要丢弃的任务
+    返回 None 表示拒绝 new_task
+    """
+    if not candidates:
+        return None
+
+    if policy == OverflowPolicy.DROP_OLDEST:
+        return min(candidates, key=lambda t: t.submitted_at)
+
+    if policy == OverflowPolicy.SHED_PRIORITY:
+        # 同为最低优先级时丢弃最新提交的，已等待较久的任务保留
+        victim = min(candidates, key=lambda t: (t.priority, -t.submitted_at))
+        return victim if victim.priority < new_task.priority else None
+
+    return None
@@ -0,0 +1,59 @@
+"""
+Qt 信号之外的低开销结果通道
+
+每次跨线程 emit 都会投递一个事件并在主线程单独分发，高频小任务时开销可观
+CompletionChannel：worker 线程把 (handler, args) 追加到 deque，
+    只在队列由空变为非空时投递一个事件，主线程处理该事件时一次取完并依次调用 handler
+    同一轮事件循环内的所有完成/进度通知只需一次事件分发
+"""
+
+import threading
+from collections import deque
+
+from PySide6.QtCore import QCoreApplication, QEvent, QObject
+
+from core.utils.logger import logger
+
+
+class CompletionChannel(QObject):
+    """必须在主线程创建，handler 均在主线程调用"""
+
+    _EVENT_TYPE = QEvent.Type(QEvent.registerEventType())
+
+    def __init__(self):
+        super().__init__()
+        self._queue = deque()  # append / popleft 本身线程安全
+        self._lock = threading.Lock()  # 只保护 _posted
+        self._posted = False
+
+    def push(self, handler, *args):
+        """任意线程调用"""
+        self._queue.append((handler, args))
+        with self._lock:
+            if self._posted:
+                return
+            self._posted = True
+        QCoreApplication.postEvent(self, QEvent(self._EVENT_TYPE))
+
+    def event(self, event):
+        if event.type() != self._EVENT_TYPE:
+            return super().event(event)
+
+        # 先清除标志再取队列，此后 push 的条目会投递新事件，不会遗漏
+        with self._lock:
+            self._posted = False
+
+        while True:
+            try:
+                handler, args = self._queue.popleft()
+            except IndexError:
+                break
+            try:
+                handler(*args)
+            except Exception as e:
+                # 单个 handler 出错不能让队列中其余的通知滞留到下一次 push
+                logger.error(f"completion handler {handler} 出现异常：{str(e)}")
+        return True
+
+
+completion_channel = CompletionChannel()
@@ -1,34 +1,123 @@
 import asyncio
+import collections
+import concurrent.futures
+import threading
+import time
+
 from PySide6.QtCore import QObject, QThread
 
+# 负载估算中，事件循环每延迟 LAG_UNIT 秒折算为一个在途协程
+LAG_UNIT = 0.01
+
 
 class IOWorker(QObject):
     """
     具体IO线程Worker，每个Worker管理一个独立事件循环
+    负载指标：在途协程数、事件循环延迟、待执行回调数，供 IOWorkerManager 调度使用
+    工作窃取：可窃取的任务先进入本 worker 的 ready 队列，同时运行的可窃取协程不超过 max_active，
+        有空位时先从自己的队头取，自己的队列为空时从最长的 peer 队列尾部窃取
+        固定的任务（submit）直接进入事件循环，不受 max_active 限制，也不会被窃取
     """
 
-    def __init__(self):
+    def __init__(self, index=0, monitor_interval=0.5, max_active=64):
         super().__init__()
+        self.index = index
+        self.monitor_interval = monitor_interval
+        self.max_active = max_active
+        self.peers = []  # 可窃取对象，包括自己，由 IOWorkerManager 设置
+
+        self.ready = collections.deque()  # (task, concurrent.futures.Future)，尚未开始的可窃取任务
+        self.active = 0  # 正在运行的可窃取协程，只在事件循环线程中修改
+        self.stolen = 0  # 从其他 worker 窃取的任务数
+        self._drain_scheduled = False
+
         self.thread = QThread()
         # QObject 默认属于创建它的线程，会阻塞主线程
         # moveToThread() 会把这个对象（和它的信号槽逻辑）交给新的线程
         self.moveToThread(self.thread)
 
+        self.loop = None
+        self._loop_ready = threading.Event()
+
+        # 负载统计，在途数由主线程与事件循环线程共同修改
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.submitted = 0
+        self.lag = 0.0  # 事件循环延迟（秒），EWMA
+        self.busy = 0.0  # 事件循环繁忙比例估计，EWMA
+
         self.thread.started.connect(self._start_loop)
         self.thread.start()
 
-        self.loop = None
-
     def _start_loop(self):
         """self.thread.start()自动调用本方法"""
         asyncio.set_event_loop(asyncio.new_event_loop())
         self.loop = asyncio.get_event_loop()
+        self._monitor = self.loop.create_task(self._monitor_loop())
+        self._loop_ready.set()
         self.loop.run_forever()
 
+    def wait_ready(self):
+        """等待事件循环创建完成并返回它，线程刚启动时 loop 为 None"""
+        self._loop_ready.wait()
+        return self.loop
+
     def submit(self, coro):
-        """提交协程到本worker的事件循环执行"""
-        if self.loop:
-            asyncio.run_coroutine_threadsafe(coro, self.loop)
+        """提交协程到本worker的事件循环执行，返回 concurrent.futures.Future"""
+        # 线程刚启动时事件循环可能尚未创建
+        self._loop_ready.wait()
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def enqueue(self, task):
+        """放入 ready 队列等待本 worker 或其他 worker 执行，返回 concurrent.futures.Future"""
+        future = concurrent.futures.Future()
+        self.ready.append((task, future))
+        return future
+
+    def has_slot(self):
+        return self.active < self.max_active
+
+    def wake(self):
+        """通知事件循环线程从 ready 队列取任务，多次调用只调度一次"""
+        self._loop_ready.wait()
+        if self._drain_scheduled:
+            return
+        self._drain_scheduled = True
+        self.loop.call_soon_threadsafe(self._drain)
+
+    def load(self):
+        """综合负载，越小越空闲"""
+        return self.in_flight + len(self.ready) + self.pending_callbacks() + self.lag / LAG_UNIT
+
+    def pending_callbacks(self):
+        """事件循环中已就绪、等待执行的回调数"""
+        # _ready 为 asyncio 内部属性，不可用时按 0 处理
+        ready = getattr(self.loop, "_ready", None)
+        return len(ready) if ready is not None else 0
+
+    def stats(self):
+        return {
+            "index": self.index,
+            "in_flight": self.in_flight,
+            "queued": len(self.ready),
+            "stolen": self.stolen,
+            "submitted": self.submitted,
+            "pending_callbacks": self.pending_callbacks(),
+            "lag_ms": round(self.lag * 1000, 3),
+            "utilization": round(self.busy, 3),
+        }
+
+    def retire(self):
+        """从 IOWorkerManager 移除后调用：不再窃取，队列中与在途的协程结束后停止事件循环与线程"""
+        self._loop_ready.wait()
+        self.peers = []
+        asyncio.run_coroutine_threadsafe(self._retire_when_idle(), self.loop)
 
     def stop(self):
         """关闭事件循环和线程"""
@@ -36,3 +125,99 @@ class IOWorker(QObject):
             self.loop.call_soon_threadsafe(self.loop.stop)
         self.thread.quit()
         self.thread.wait()
+
+    # helpers
+    def _on_done(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _drain(self):
+        """在事件循环线程中运行，填满空位"""
+        self._drain_scheduled = False
+        while self.has_slot():
+            job = self._take()
+            if job is None:
+                return
+            self._start(*job)
+
+    def _take(self):
+        # deque 的 popleft / pop 是原子操作，与其他线程的 append 及窃取并发安全
+        try:
+            return self.ready.popleft()
+        except IndexError:
+            pass
+
+        victim = max(self.peers, key=lambda w: len(w.ready), default=None)
+        if victim is None or victim is self:
+            return None
+        try:
+            # 从尾部窃取，与所有者从头部取互不干扰
+            job = victim.ready.pop()
+        except IndexError:
+            return None
+        self.stolen += 1
+        return job
+
+    def _start(self, task, future):
+        if future.cancelled():
+            return
+
+        task.loop = self.loop
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+        self.active += 1
+        atask = self.loop.create_task(task.run())
+
+        def on_task_done(_):
+            self.active -= 1
+            self._on_done(None)
+            try:
+                _copy_state(atask, future)
+            finally:
+                # 其他线程同时 cancel future 时 set_result 会抛出 InvalidStateError，空位仍要填上
+                self._drain()
+
+        atask.add_done_callback(on_task_done)
+        # 与 run_coroutine_threadsafe 一致：取消 future 即取消协程
+        future.add_done_callback(
+            lambda f: self.loop.call_soon_threadsafe(atask.cancel) if f.cancelled() else None
+        )
+
+    async def _retire_when_idle(self):
+        while self.in_flight or self.ready:
+            await asyncio.sleep(self.monitor_interval)
+        self._monitor.cancel()
+        await asyncio.sleep(0)  # 让 monitor 处理取消，避免事件循环销毁时告警
+        self.loop.stop()
+        self.thread.quit()
+
+    async def _monitor_loop(self):
+        """
+        周期性测量事件循环延迟：sleep(interval) 实际耗时超出 interval 的部分即为延迟
+        繁忙比例按 延迟 / 实际耗时 估计，循环被回调占满时趋近 1
+        """
+        alpha = 0.3
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.monitor_interval)
+            elapsed = time.monotonic() - start
+            lag = max(0.0, elapsed - self.monitor_interval)
+
+            self.lag = alpha * lag + (1 - alpha) * self.lag
+            self.busy = alpha * (lag / elapsed) + (1 - alpha) * self.busy
+
+
+def _copy_state(atask, future):
+    """将 asyncio.Task 的结果复制到 concurrent.futures.Future"""
+    if future.cancelled():
+        return
+    try:
+        if atask.cancelled():
+            future.cancel()
+        elif atask.exception() is not None:
+            future.set_exception(atask.exception())
+        else:
+            future.set_result(atask.result())
+    except concurrent.futures.InvalidStateError:
+        pass  # 检查之后被其他线程取消
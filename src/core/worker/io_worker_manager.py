@@ -1,29 +1,245 @@
 import random
+import threading
+import time
 
 from PySide6.QtCore import QObject
 
 from core.base.base_task import AsyncTask
+from core.utils.config_manager import config
+from core.utils.logger import logger
+from core.utils.metrics import metrics
+from core.worker.backpressure import OverflowPolicy, choose_victim, validate_policy
 from core.worker.io_worker import IOWorker
+from core.worker.task_handle import TaskHandle
 
 
 class IOWorkerManager(QObject):
     """
     IO异步任务管理器，内部多个 worker 分别跑独立事件循环
+    调度策略：
+        least_loaded：选择负载最小的 worker
+        p2c：随机取两个 worker，选择负载较小者，worker 较多时开销更低且不易扎堆
+        random：随机选择
+    task.worker_index 不为空或 task.stealable 为 False 时固定在一个 worker 上，
+        其余任务进入所选 worker 的 ready 队列，空闲的 worker 会从其他 worker 的队列中窃取，见 IOWorker
+    伸缩：resize 在运行时增减 worker，只能在主线程调用；
+        缩小时从编号最大的 worker 开始退役，退役的 worker 执行完已接收的协程后释放线程
+    背压：max_in_flight 限制在途协程总数，满时按 overflow_policy 处理，
+        drop_oldest / shed_priority 会真正取消被丢弃的协程
     """
 
-    def __init__(self, num_workers=1):
+    POLICIES = ("least_loaded", "p2c", "random")
+
+    def __init__(self, num_workers=1, policy="least_loaded", monitor_interval=0.5,
+                 max_in_flight=None, overflow_policy=OverflowPolicy.BLOCK, block_timeout=None,
+                 max_active=64):
         super().__init__()
-        self.workers = [IOWorker() for _ in range(num_workers)]
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的调度策略: {policy}")
+        self.policy = policy
+        self.monitor_interval = monitor_interval
+        self.max_active = max_active
+        # resize 整体替换 workers 列表，提交与伸缩由 _workers_lock 互斥
+        self._workers_lock = threading.Lock()
+        self.workers = []
+        self._retired = []  # 退役中的 worker，线程结束前保持引用
+        self.resize(num_workers)
+
+        self.max_in_flight = max_in_flight
+        self.overflow_policy = validate_policy(overflow_policy)
+        self.block_timeout = block_timeout
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._in_flight = {}  # task -> concurrent.futures.Future，提交前为 None
+
+    def submit(self, task: AsyncTask, worker_index=None):
+        """
+        按调度策略挑选一个worker提交任务，worker_index 用于固定到指定 worker
+        返回 TaskHandle，可用于取消与等待结果；在途协程已满被拒绝时 task 发出 error 并返回 None
+        """
+        if not self._reserve(task):
+            return None
+
+        if worker_index is None:
+            worker_index = task.worker_index
+
+        with self._workers_lock:
+            if worker_index is not None:
+                # worker 数减少后，原编号折回现有的 worker
+                worker = self.workers[worker_index % len(self.workers)]
+            else:
+                worker = self._select_worker()
+
+            logger.debug(f"{task} -> IOWorker {worker.index}")
+            task.submitted_at = time.monotonic()
+            if worker_index is not None or not task.stealable:
+                # 新启动的 worker 事件循环可能尚未创建
+                task.loop = worker.wait_ready()
+                task.worker_index = worker.index
+                future = worker.submit(task.run())
+            else:
+                future = worker.enqueue(task)
+                self._kick(worker)
+
+        with self._lock:
+            self._in_flight[task] = future
+        task.done_hook = self._release
+        future.add_done_callback(lambda f: self._on_future_done(task, f))
+        task.handle = TaskHandle(task, future)
+        return task.handle
+
+    def resize(self, num_workers):
+        """调整事件循环数量"""
+        if num_workers < 1:
+            raise ValueError(f"num_workers 至少为 1: {num_workers}")
+
+        with self._workers_lock:
+            workers = list(self.workers)
+            while len(workers) < num_workers:
+                worker = IOWorker(len(workers), self.monitor_interval, self.max_active)
+                self._register_gauges(worker)
+                workers.append(worker)
+            retired = workers[num_workers:]
+            workers = workers[:num_workers]
+            for worker in workers:
+                worker.peers = workers
+            self.workers = workers
+
+        self._retired = [w for w in self._retired if not w.thread.isFinished()]
+        for worker in retired:
+            logger.info(f"IOWorker {worker.index} 退役")
+            self._unregister_gauges(worker)
+            worker.retire()
+            self._retired.append(worker)
+
+    def utilization(self):
+        """各事件循环繁忙比例的平均值"""
+        workers = self.workers
+        return sum(w.busy for w in workers) / len(workers)
+
+    def queued_count(self):
+        """ready 队列中等待开始的协程数"""
+        return sum(len(w.ready) for w in self.workers)
+
+    def capacity(self):
+        """剩余可提交的协程数，不限制时返回 None"""
+        if self.max_in_flight is None:
+            return None
+        with self._lock:
+            return max(0, self.max_in_flight - len(self._in_flight))
 
-    def submit(self, task: AsyncTask):
-        """随机挑选一个worker提交任务"""
-        worker = random.choice(self.workers)
-        task.loop = worker.loop
-        worker.submit(task.run)
+    def stats(self):
+        """各事件循环的负载与利用率，可据此调整 num_workers"""
+        return [worker.stats() for worker in self.workers]
 
     def shutdown(self):
-        for worker in self.workers:
+        with self._lock:
+            self.max_in_flight = None  # 放行被阻塞的提交方
+            self._space.notify_all()
+        for worker in self.workers + self._retired:
             worker.stop()
 
+    # helpers
+    @staticmethod
+    def _register_gauges(worker):
+        labels = {"worker": worker.index}
+        metrics.register_gauge("io_in_flight", lambda: worker.in_flight, **labels)
+        metrics.register_gauge("io_queued", lambda: len(worker.ready), **labels)
+        metrics.register_gauge("io_stolen", lambda: worker.stolen, **labels)
+        metrics.register_gauge("io_pending_callbacks", worker.pending_callbacks, **labels)
+        metrics.register_gauge("io_loop_lag_seconds", lambda: worker.lag, **labels)
+        metrics.register_gauge("io_loop_utilization", lambda: worker.busy, **labels)
+
+    @staticmethod
+    def _unregister_gauges(worker):
+        labels = {"worker": worker.index}
+        for name in ("io_in_flight", "io_queued", "io_stolen", "io_pending_callbacks",
+                     "io_loop_lag_seconds", "io_loop_utilization"):
+            metrics.unregister_gauge(name, **labels)
+
+    def _reserve(self, task):
+        """占用一个在途名额，必要时按溢出策略丢弃其他协程"""
+        victim = None
+        victim_future = None
+        with self._lock:
+            if self._is_full():
+                if self.overflow_policy == OverflowPolicy.BLOCK:
+                    self._space.wait_for(lambda: not self._is_full(), self.block_timeout)
+                else:
+                    # 尚未拿到 future 的协程正在提交，不参与丢弃
+                    candidates = [t for t, f in self._in_flight.items() if f is not None]
+                    victim = choose_victim(self.overflow_policy, candidates, task)
+                    if victim is not None:
+                        victim_future = self._in_flight.pop(victim)
+
+            accepted = not self._is_full()
+            if accepted:
+                self._in_flight[task] = None
+
+        if victim is not None:
+            # 先发出 error 再取消，取消引起的结束通知会因已 settle 而丢弃
+            self._overflow(victim, "在途协程已满，任务被取消")
+            victim_future.cancel()
+        if not accepted:
+            self._overflow(task, "在途协程已满，任务被拒绝")
+        return accepted
+
+    def _on_future_done(self, task, future):
+        if future.cancelled() and task.started_at is not None:
+            # 运行中的协程被取消时 future 立即结束，协程仍在收尾；
+            # 由 run 的 CancelledError 处理发出通知，结束后经 done_hook 释放名额
+            return
+
+        self._release(task)
+        # 协程尚未开始就被取消时 run 不会执行，在这里补发结束通知
+        if future.cancelled() and task.settle():
+            logger.info(f"{task} 在开始前被取消")
+            task.record_outcome("cancel")
+            task.emit_finished(False, None)
+
+    def _release(self, task):
+        """释放在途名额，可重复调用"""
+        with self._lock:
+            if self._in_flight.pop(task, None) is not None:
+                self._space.notify()
+
+    def _is_full(self):
+        return self.max_in_flight is not None and len(self._in_flight) >= self.max_in_flight
+
+    def _overflow(self, task, message):
+        if not task.settle():
+            return
+        logger.warning(f"{task}: {message}")
+        metrics.inc("task_overflow_total", policy=self.overflow_policy, task=type(task).__name__,
+                    service=task.owner or "")
+        task.emit_error(message)
+
+    def _kick(self, worker):
+        """所选 worker 已满时唤醒最空闲的有空位 worker，由它窃取"""
+        if not worker.has_slot():
+            idle = [w for w in self.workers if w.has_slot()]
+            if not idle:
+                return  # 所有 worker 都满了，任务在队列中等待，有协程结束时会被取走
+            worker = min(idle, key=lambda w: w.load())
+        worker.wake()
+
+    def _select_worker(self):
+        if len(self.workers) == 1 or self.policy == "random":
+            return random.choice(self.workers)
+
+        if self.policy == "p2c":
+            candidates = random.sample(self.workers, 2)
+        else:
+            candidates = self.workers
+        return min(candidates, key=lambda w: w.load())
+
 
-io_worker_manager = IOWorkerManager()
+io_worker_manager = IOWorkerManager(
+    config["worker"]["io"]["num_workers"],
+    config["worker"]["io"]["policy"],
+    config["worker"]["io"]["monitor_interval"],
+    config["worker"]["io"]["max_in_flight"],
+    config["worker"]["io"]["overflow_policy"],
+    config["worker"]["io"]["block_timeout"],
+    config["worker"]["io"]["max_active"],
+)
@@ -0,0 +1,146 @@
+"""
+进程池执行后端：绕开 GIL，让纯 Python 的 CPU 密集型任务随核心数扩展
+WorkerManager 只在有空闲子进程时提交，executor 内部不会积压任务
+
+只有 ProcessTask 的类与 get_state() 的返回值会被 pickle 到子进程，
+子进程中调用 task_cls.execute_in_process(state, report_progress)
+    进度：经 multiprocessing.Queue 回到主进程，由监听线程经 task.report_progress 限流后转发
+    结果/异常：由 Future 回调转为 task.finished / task.error 通知
+信号均在非主线程发出，service 中的槽函数会以队列连接的方式在主线程执行
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from core.utils.logger import logger
+
+# 子进程中由 initializer 设置
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_in_process(task_cls, task_id, state):
+    """子进程入口"""
+
+    def report_progress(value):
+        _progress_queue.put((task_id, value))
+
+    return task_cls.execute_in_process(state, report_progress)
+
+
+class ProcessPoolBackend:
+    """
+    进程池在第一次提交任务时才创建，未使用时不启动任何子进程
+    正在子进程中运行的任务无法取消，request_cancel 只能撤销仍在排队的任务
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count()
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._progress_queue = None
+        self._listener = None
+        self._tasks = {}  # task_id -> task，用于转发进度
+        self._futures = {}  # task_id -> future，用于撤销
+
+    def submit(self, task):
+        self._ensure_started()
+
+        task_id = id(task)
+        with self._lock:
+            self._tasks[task_id] = task
+
+        logger.info(f"{task.name} 提交到进程池")
+        # 子进程何时开始执行无法得知，执行时间包含进程池内的排队
+        task.mark_started()
+        task.is_running = True
+        task.emit_started()
+        # 参数在 executor 的内部线程中 pickle，失败时体现为 future 的异常
+        future = self._executor.submit(_run_in_process, type(task), task_id, task.get_state())
+        with self._lock:
+            self._futures[task_id] = future
+        future.add_done_callback(lambda f: self._on_done(task, f))
+
+    def cancel(self, task):
+        """撤销尚未开始的任务，成功返回 True"""
+        with self._lock:
+            future = self._futures.get(id(task))
+        return future is not None and future.cancel()
+
+    def shutdown(self):
+        """程序退出前调用，撤销排队任务并等待子进程退出"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+
+        executor.shutdown(wait=True, cancel_futures=True)
+        self._progress_queue.put(None)
+        self._listener.join()
+        logger.info("进程池已关闭")
+
+    # helpers
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is not None:
+                return
+
+            self._progress_queue = multiprocessing.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self._progress_queue,),
+            )
+            self._listener = threading.Thread(
+                target=self._forward_progress, name="ProcessPoolProgress", daemon=True
+            )
+            self._listener.start()
+
+    def _forward_progress(self):
+        """监听线程：把子进程的进度转发为信号"""
+        while True:
+            item = self._progress_queue.get()
+            if item is None:
+                break
+
+            task_id, value = item
+            with self._lock:
+                task = self._tasks.get(task_id)
+            if task is not None:
+                task.report_progress(value)
+
+    def _on_done(self, task, future):
+        """Future 完成回调，运行在 executor 的内部线程"""
+        with self._lock:
+            self._tasks.pop(id(task), None)
+            self._futures.pop(id(task), None)
+        task.is_running = False
+
+        try:
+            if future.cancelled():
+                task.record_outcome("cancel")
+                task.emit_finished(False, None)
+                return
+
+            e = future.exception()
+            if e is not None:
+                logger.error(f"{task.name} 执行失败，出现异常：{str(e)}")
+                task.record_outcome("error")
+                task.emit_error(f"任务失败: {str(e)}")
+                return
+
+            logger.info(f"{task.name} 执行完毕")
+            task.flush_progress()
+            success = not task._is_canceled
+            task.record_outcome("success" if success else "cancel")
+            task.emit_finished(success, future.result())
+        finally:
+            if task.done_hook:
+                task.done_hook(task)
@@ -0,0 +1,262 @@
+"""
+任务依赖图：在 worker_manager / io_worker_manager 之上按依赖顺序执行一组任务
+
+    graph = TaskGraph("Pipeline")
+    graph.add("crawl", lambda: CrawlTask(url))
+    graph.add("parse", lambda page: ParseTask(page), deps=["crawl"])
+    parts = graph.map("encrypt", lambda chunk, text: EncryptTask(chunk, pwd), chunks, deps=["parse"])
+    graph.add("merge", lambda *results: b"".join(results), deps=parts)
+    graph.completed.connect(on_done)
+    graph.start()
+
+节点由工厂函数创建，参数为各依赖节点的结果（按 deps 顺序），map 创建的节点以 item 为第一个参数
+    工厂返回 BaseTask：交给 worker_manager 执行，AsyncTask 交给 io_worker_manager
+    返回其他值：直接作为节点结果，适合合并结果等轻量步骤
+依赖满足的节点立即提交，互不依赖的分支并行执行
+阶段之间在 worker 线程中直接衔接（DirectConnection），不经过 GUI 线程的事件循环
+任一节点出错或被取消时，整个图停止并撤销其余节点
+"""
+
+import functools
+import threading
+import time
+
+from PySide6.QtCore import QObject, Qt, Signal
+
+from core.base.base_task import AsyncTask, BaseTask
+from core.utils.logger import logger
+from core.utils.metrics import metrics
+from core.worker.io_worker_manager import io_worker_manager
+from core.worker.worker_manager import worker_manager
+
+
+class _Node:
+    def __init__(self, key, factory, deps, weight):
+        self.key = key
+        self.factory = factory
+        self.deps = list(deps)
+        self.weight = weight  # 汇总进度时的权重
+        self.dependents = []
+        self.remaining = len(self.deps)  # 尚未完成的依赖数
+        self.task = None
+        self.progress = 0
+        self.done = False
+
+
+class TaskGraph(QObject):
+    """
+    有向无环任务图，依赖必须先于节点添加，因此不会出现环
+    completed 在全部节点完成（True, {key: result}）或被取消（False, None）时发出
+    error 在节点出错时发出，此后不再发出 completed
+    """
+
+    progress = Signal(int)  # 按节点权重汇总的 0-100 进度
+    completed = Signal(bool, object)
+    error = Signal(str, str)  # 出错节点 key, message
+
+    progress_max_rate = 20  # 单个节点进度的限流，同 BaseService
+
+    def __init__(self, name, owner=None, priority=None):
+        super().__init__()
+        self.name = name
+        self.owner = owner or name  # 提交到 worker_manager 时的 service 名，参与公平调度
+        self.priority = priority
+
+        self._nodes = {}  # key -> _Node，保持添加顺序
+        self._results = {}
+        self._done_count = 0
+        self._total_weight = 0
+        self._weighted_progress = 0  # sum(weight * progress)，增量维护，避免每次进度更新遍历全部节点
+        self._lock = threading.Lock()
+        self._state = "idle"  # idle / running / success / cancel / error
+        self._started_at = None
+        self._last_progress = None
+
+    def add(self, key, factory, deps=(), weight=1):
+        """添加节点，返回 key"""
+        if self._state != "idle":
+            raise RuntimeError("任务图已启动，不能再添加节点")
+        if key in self._nodes:
+            raise ValueError(f"重复的节点: {key}")
+        for dep in deps:
+            if dep not in self._nodes:
+                raise ValueError(f"未知的依赖节点: {dep}")
+
+        node = _Node(key, factory, deps, weight)
+        for dep in node.deps:
+            self._nodes[dep].dependents.append(node)
+        self._nodes[key] = node
+        self._total_weight += weight
+        return key
+
+    def map(self, key, factory, items, deps=(), weight=1):
+        """扇出：为每个 item 添加一个节点 key[i]，返回节点 key 列表，可作为汇总节点的 deps"""
+        return [
+            self.add(f"{key}[{i}]", functools.partial(factory, item), deps, weight)
+            for i, item in enumerate(items)
+        ]
+
+    def start(self):
+        with self._lock:
+            if self._state != "idle":
+                raise RuntimeError("任务图只能启动一次")
+            self._state = "running"
+            self._started_at = time.monotonic()
+            ready = [node for node in self._nodes.values() if not node.deps]
+
+        logger.info(f"{self.name} 开始执行，共 {len(self._nodes)} 个节点")
+        if not self._nodes:
+            self._settle("success")
+            self.completed.emit(True, {})
+            return
+        self._launch(ready)
+
+    def cancel(self):
+        """取消整个图：排队中的节点直接撤销，执行中的节点请求取消，未提交的节点不再提交"""
+        running = self._settle("cancel")
+        if running is None:
+            return
+
+        logger.info(f"{self.name} 已取消")
+        for task in running:
+            self._cancel_task(task)
+        self.completed.emit(False, None)
+
+    def is_running(self):
+        return self._state == "running"
+
+    def results(self):
+        """已完成节点的结果"""
+        with self._lock:
+            return dict(self._results)
+
+    # helpers
+    def _launch(self, nodes):
+        for node in nodes:
+            with self._lock:
+                if self._state != "running":
+                    return
+                args = [self._results[dep] for dep in node.deps]
+
+            try:
+                task = node.factory(*args)
+            except Exception as e:
+                logger.error(f"{self.name}: 创建节点 {node.key} 失败：{str(e)}")
+                self._fail(node, f"创建任务失败: {str(e)}")
+                return
+
+            if not isinstance(task, BaseTask):
+                self._node_done(node, task)
+                continue
+
+            with self._lock:
+                if self._state != "running":
+                    return
+                node.task = task
+            self._submit(node, task)
+
+    def _submit(self, node, task):
+        task.set_progress_limits(self.progress_max_rate)
+        # 回调在发出信号的 worker 线程中执行，下一阶段随即提交
+        task.progress.connect(lambda value: self._on_progress(node, value), Qt.DirectConnection)
+        task.finished.connect(
+            lambda _task, success, result: self._on_finished(node, success, result), Qt.DirectConnection
+        )
+        task.error.connect(lambda _task, message: self._fail(node, message), Qt.DirectConnection)
+
+        logger.debug(f"{self.name}: 提交节点 {node.key} -> {task}")
+        if isinstance(task, AsyncTask):
+            io_worker_manager.submit(task)
+        else:
+            worker_manager.execute(task, owner=self.owner, priority=self.priority)
+
+    def _on_progress(self, node, value):
+        with self._lock:
+            if self._state != "running":
+                return
+            self._set_node_progress(node, value)
+            progress = self._changed_progress()
+        if progress is not None:
+            self.progress.emit(progress)
+
+    def _on_finished(self, node, success, result):
+        if not success:
+            # 节点被单独取消，图无法继续
+            self.cancel()
+            return
+        self._node_done(node, result)
+
+    def _node_done(self, node, result):
+        with self._lock:
+            if self._state != "running":
+                return
+            node.done = True
+            self._set_node_progress(node, 100)
+            self._results[node.key] = result
+            self._done_count += 1
+
+            ready = []
+            for dependent in node.dependents:
+                dependent.remaining -= 1
+                if dependent.remaining == 0:
+                    ready.append(dependent)
+            progress = self._changed_progress()
+            all_done = self._done_count == len(self._nodes)
+
+        if progress is not None:
+            self.progress.emit(progress)
+        if all_done:
+            if self._settle("success") is None:
+                return  # 与 cancel 同时发生，以先到者为准
+            logger.info(f"{self.name} 执行完毕")
+            self.completed.emit(True, self.results())
+            return
+        self._launch(ready)
+
+    def _fail(self, node, message):
+        running = self._settle("error")
+        if running is None:
+            return
+
+        logger.error(f"{self.name}: 节点 {node.key} 失败，撤销其余节点：{message}")
+        for task in running:
+            if task is not node.task:
+                self._cancel_task(task)
+        self.error.emit(node.key, message)
+
+    def _settle(self, outcome):
+        """结束运行状态，返回仍在执行的任务；已经结束时返回 None"""
+        with self._lock:
+            if self._state not in ("running", "idle"):
+                return None
+            self._state = outcome
+            running = [n.task for n in self._nodes.values() if n.task is not None and not n.done]
+
+        metrics.inc("task_graph_total", outcome=outcome, graph=self.owner)
+        if self._started_at is not None:
+            metrics.observe("task_graph_run_seconds", time.monotonic() - self._started_at, graph=self.owner)
+        return running
+
+    @staticmethod
+    def _cancel_task(task):
+        if isinstance(task, AsyncTask):
+            if task.handle:
+                task.handle.cancel()
+        elif not worker_manager.cancel(task):
+            task.request_cancel()
+
+    def _set_node_progress(self, node, value):
+        self._weighted_progress += node.weight * (value - node.progress)
+        node.progress = value
+
+    def _changed_progress(self):
+        """在锁内调用，汇总进度有变化时返回新值"""
+        total = self._total_weight
+        progress = int(self._weighted_progress / total) if total else 100
+        if progress == self._last_progress:
+            return None
+        self._last_progress = progress
+        return progress
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,56 @@
+import asyncio
+import concurrent.futures
+
+
+class TaskHandle:
+    """
+    IOWorkerManager.submit 返回的句柄，可在任意线程使用
+    cancel：排队中的任务不再执行；运行中的协程在其事件循环中被取消，
+        await 处抛出 CancelledError，async with / try-finally 持有的连接、页面随即释放
+    等待：主线程可 wait(timeout) / result(timeout)，其他事件循环中可直接 await handle
+    结果：execute 的返回值；任务出错时 result 抛出原异常，被取消时抛出 CancelledError
+    """
+
+    def __init__(self, task, future: concurrent.futures.Future):
+        self.task = task
+        self._future = future
+
+    def cancel(self):
+        """请求取消，任务已结束时返回 False"""
+        self.task.request_cancel()
+        return self._future.cancel()
+
+    def done(self):
+        return self._future.done()
+
+    def cancelled(self):
+        return self._future.cancelled()
+
+    def wait(self, timeout=None):
+        """阻塞等待任务结束，返回是否已结束；不抛出任务的异常"""
+        done, _ = concurrent.futures.wait([self._future], timeout)
+        return bool(done)
+
+    def result(self, timeout=None):
+        """阻塞等待并返回结果，超时抛出 TimeoutError"""
+        return self._future.result(timeout)
+
+    def exception(self, timeout=None):
+        return self._future.exception(timeout)
+
+    def add_done_callback(self, callback):
+        """callback(handle) 在任务结束的线程中调用"""
+        self._future.add_done_callback(lambda _: callback(self))
+
+    def __await__(self):
+        # 包装为当前事件循环的 future，可跨事件循环等待
+        return asyncio.wrap_future(self._future).__await__()
+
+    def __repr__(self):
+        if self._future.cancelled():
+            state = "cancelled"
+        elif self._future.done():
+            state = "done"
+        else:
+            state = "pending"
+        return f"<TaskHandle {self.task} {state}>"
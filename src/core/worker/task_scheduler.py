@@ -0,0 +1,120 @@
+"""
+线程池前的任务调度器：优先级 + 老化 + 按 service 加权公平
+
+优先级与老化：
+    有效优先级 = priority + 等待秒数 / aging_interval
+    排序键取 submit_time - priority * aging_interval，它与当前时间无关，
+    所以可以直接放进堆里，低优先级任务等得足够久后自然排到前面
+公平共享：
+    有效优先级相差不足一级的 service 之间，选虚拟时间（已调度数 / weight）最小者
+    quota 限制单个 service 同时占用的线程数，防止批量任务占满线程池
+"""
+
+import heapq
+import itertools
+import time
+
+UNLIMITED = -1  # set_policy 的 quota 取该值时取消并发配额
+
+
+class _ServiceQueue:
+    """单个 service 的待调度任务"""
+
+    def __init__(self, weight, quota):
+        self.weight = weight
+        self.quota = quota  # None 表示不限制
+        self.heap = []  # (排序键, seq, task)
+        self.running = 0
+        self.vtime = 0.0
+
+    def runnable(self):
+        return self.heap and (self.quota is None or self.running < self.quota)
+
+
+class TaskScheduler:
+    """非线程安全，由 WorkerManager 加锁调用"""
+
+    def __init__(self, aging_interval=1.0, default_weight=1, default_quota=None):
+        self.aging_interval = aging_interval
+        self.default_weight = default_weight
+        self.default_quota = default_quota
+
+        self._queues = {}  # owner -> _ServiceQueue
+        self._seq = itertools.count()
+        self._pending = 0
+
+    def set_policy(self, owner, weight=None, quota=None):
+        """设置 service 的权重与并发配额，为 None 的项保持不变；quota 为 UNLIMITED 时取消配额"""
+        queue = self._get_queue(owner)
+        if weight is not None:
+            queue.weight = weight
+        if quota is not None:
+            queue.quota = None if quota == UNLIMITED else quota
+
+    def push(self, task, owner, priority):
+        queue = self._get_queue(owner)
+        if not queue.heap:
+            # 刚变为活跃的 service 不能凭借空闲期积累的虚拟时间抢占线程
+            queue.vtime = max(queue.vtime, self._min_vtime())
+
+        key = time.monotonic() - priority * self.aging_interval
+        heapq.heappush(queue.heap, (key, next(self._seq), task))
+        self._pending += 1
+
+    def pop(self):
+        """取出下一个应执行的任务，没有可执行任务时返回 None"""
+        candidates = [q for q in self._queues.values() if q.runnable()]
+        if not candidates:
+            return None
+
+        # 排序键越小，有效优先级越高；相差不足一个老化周期的视为同一级
+        best_key = min(q.heap[0][0] for q in candidates)
+        same_level = [q for q in candidates if q.heap[0][0] - best_key < self.aging_interval]
+        queue = min(same_level, key=lambda q: q.vtime)
+
+        _, _, task = heapq.heappop(queue.heap)
+        queue.running += 1
+        queue.vtime += 1 / queue.weight
+        self._pending -= 1
+        return task
+
+    def task_done(self, owner):
+        queue = self._queues.get(owner)
+        if queue and queue.running > 0:
+            queue.running -= 1
+
+    def remove(self, task, owner):
+        """移除尚未调度的任务，成功返回 True"""
+        queue = self._queues.get(owner)
+        if not queue:
+            return False
+
+        for i, entry in enumerate(queue.heap):
+            if entry[2] is task:
+                queue.heap.pop(i)
+                heapq.heapify(queue.heap)
+                self._pending -= 1
+                return True
+        return False
+
+    def pending_tasks(self):
+        """所有尚未调度的任务"""
+        return [entry[2] for queue in self._queues.values() for entry in queue.heap]
+
+    def pending_count(self, owner=None):
+        if owner is None:
+            return self._pending
+        queue = self._queues.get(owner)
+        return len(queue.heap) if queue else 0
+
+    # helpers
+    def _get_queue(self, owner):
+        queue = self._queues.get(owner)
+        if queue is None:
+            queue = _ServiceQueue(self.default_weight, self.default_quota)
+            self._queues[owner] = queue
+        return queue
+
+    def _min_vtime(self):
+        active = [q.vtime for q in self._queues.values() if q.heap or q.running]
+        return min(active) if active else 0.0
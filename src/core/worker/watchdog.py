@@ -0,0 +1,67 @@
+import threading
+import time
+
+from core.utils.logger import logger
+
+
+class TaskWatchdog:
+    """
+    监视设置了 deadline 的运行中任务，运行在独立的守护线程
+    超过 deadline：上报并 request_cancel，任务在下一个 check_cancelled 处结束
+    超过 deadline + quarantine_grace 仍未结束：调用 on_quarantine 隔离任务，释放其线程池名额
+    Python 线程无法强制终止，被隔离的任务仍在后台运行直到自行返回
+    """
+
+    def __init__(self, on_overrun, on_quarantine, interval=1.0, quarantine_grace=None):
+        """quarantine_grace 为 None 时不隔离，只上报"""
+        self.on_overrun = on_overrun
+        self.on_quarantine = on_quarantine
+        self.interval = interval
+        self.quarantine_grace = quarantine_grace
+
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._reported = set()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def watch(self, task):
+        with self._lock:
+            self._tasks.add(task)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="TaskWatchdog", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, task):
+        with self._lock:
+            self._tasks.discard(task)
+            self._reported.discard(task)
+
+    def stop(self):
+        self._stop.set()
+
+    # helpers
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._check()
+
+    def _check(self):
+        now = time.monotonic()
+        with self._lock:
+            running = [t for t in self._tasks if t.is_running and t.started_at is not None]
+
+        for task in running:
+            overrun = now - task.started_at - task.deadline
+            if overrun <= 0:
+                continue
+
+            if task not in self._reported:
+                self._reported.add(task)
+                logger.warning(f"{task} 超过 deadline {task.deadline}s，请求取消")
+                task.request_cancel()
+                self.on_overrun(task, now - task.started_at)
+
+            if self.quarantine_grace is not None and overrun > self.quarantine_grace:
+                logger.error(f"{task} 超时 {overrun:.1f}s 仍未结束，隔离")
+                self.unwatch(task)
+                self.on_quarantine(task)
@@ -4,14 +4,30 @@ IO 任务会与计算任务相互阻塞，所以分离IO与计算线程
 通信机制，即task如何与service通信：回调/QT信号，
     前者增加了复杂度，后者性能有问题。
     考虑到项目非高频爬虫，姑且使用QT信号机制
+
+调度：任务先进入 TaskScheduler，有空闲线程时才交给 QThreadPool，
+    避免某个插件的大批量任务排在交互任务之前占满线程池
+    process_safe 的任务不占用线程，进入单独的 TaskScheduler，有空闲子进程时才交给进程池，
+    优先级、老化与 service 的权重、配额同样生效（配额按进程数计）
+背压：max_pending 限制排队任务数（线程与进程任务合计），队列满时按 overflow_policy 处理，见 backpressure.py
+超时：设置了 deadline 的任务由 TaskWatchdog 监视，超时过久的任务被隔离，
+    线程池临时扩容一个线程补上被占用的名额，任务最终返回后再收回
 """
 
-from PySide6.QtCore import QObject, QThreadPool
+import threading
+import time
+
+from PySide6.QtCore import QObject, QThreadPool, Signal
 from core.base.base_task import BaseTask
+from core.utils.config_manager import config
 from core.utils.logger import logger
+from core.utils.metrics import metrics
+from core.worker.backpressure import OverflowPolicy, choose_victim, validate_policy
+from core.worker.process_pool import ProcessPoolBackend
+from core.worker.task_scheduler import TaskScheduler
+from core.worker.watchdog import TaskWatchdog
 
 
-# todo: 调度问题
 # todo：对于高频小数据量爬虫，可缓存数据，定期投放给 service
 
 class WorkerManager(QObject):
@@ -24,23 +40,259 @@ class WorkerManager(QObject):
     # task_completed = Signal(BaseTask, bool, str)  # (任务, 是否成功, 消息)
     # task_error = Signal(BaseTask, str)
 
-    def __init__(self, max_concurrent=4):
+    task_overrun = Signal(str, float)  # (任务名, 已运行秒数)
+
+    def __init__(self, max_concurrent=4, aging_interval=1.0, service_policies=None, max_processes=None,
+                 watchdog_interval=1.0, quarantine_grace=None,
+                 max_pending=None, overflow_policy=OverflowPolicy.REJECT, block_timeout=None):
+        """
+        service_policies: {service 名: {"weight": 权重, "quota": 最大并发数}}
+        max_processes: 进程池大小，默认为 CPU 核心数
+        quarantine_grace: 超过 deadline 多少秒后隔离任务，None 表示只上报不隔离
+        max_pending: 排队任务数上限，等待子进程的 process_safe 任务同样计入，None 表示不限制
+        block_timeout: block 策略的最长等待秒数，None 表示一直等待
+        """
         super().__init__()
+        self.max_concurrent = max_concurrent
         self.thread_pool = QThreadPool()
         self.thread_pool.setMaxThreadCount(max_concurrent)
+        self.process_backend = ProcessPoolBackend(max_processes)
+
+        # execute 来自主线程，done_hook 来自 worker 线程
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)  # 排队任务出队时通知
+        self._running = 0
+
+        self.max_pending = max_pending
+        self.overflow_policy = validate_policy(overflow_policy)
+        self.block_timeout = block_timeout
+        self.scheduler = TaskScheduler(aging_interval)
+        self.max_processes = self.process_backend.max_workers
+        self._process_running = 0
+        self.process_scheduler = TaskScheduler(aging_interval)
+        for owner, policy in (service_policies or {}).items():
+            self.set_service_policy(owner, policy.get("weight"), policy.get("quota"))
+
+        self.watchdog = TaskWatchdog(self._on_overrun, self._quarantine, watchdog_interval, quarantine_grace)
+
+        self._gauged_owners = set()
+        metrics.register_gauge("worker_queue_depth", self.pending_count)
+        metrics.register_gauge("worker_running", lambda: self._running)
+        metrics.register_gauge("worker_max_concurrent", lambda: self.max_concurrent)
+
+    def execute(self, task: BaseTask, owner=None, priority=None):
+        """提交任务，由调度器决定执行顺序；队列满被拒绝时 task 发出 error 并返回 False"""
+        logger.debug(f"new task:{task}, owner={owner}")
+        if priority is not None:
+            task.priority = priority
+        task.owner = owner
+        task.submitted_at = time.monotonic()
+        self._register_owner_gauge(owner)
+        scheduler = self._scheduler_of(task)
+
+        victim = None
+        with self._lock:
+            if self._is_full():
+                if self.overflow_policy == OverflowPolicy.BLOCK:
+                    self._space.wait_for(lambda: not self._is_full(), self.block_timeout)
+                else:
+                    pending = self.scheduler.pending_tasks() + self.process_scheduler.pending_tasks()
+                    victim = choose_victim(self.overflow_policy, pending, task)
+                    if victim is not None:
+                        self._scheduler_of(victim).remove(victim, victim.owner)
+
+            accepted = not self._is_full()
+            if accepted:
+                scheduler.push(task, owner, task.priority)
+
+        if victim is not None:
+            self._overflow(victim, "队列已满，任务被丢弃")
+        if not accepted:
+            self._overflow(task, "队列已满，任务被拒绝")
+            return False
+
+        self._dispatch()
+        return True
+
+    def cancel(self, task: BaseTask):
+        """撤销尚未开始执行的任务，成功返回 True"""
+        with self._lock:
+            removed = self._scheduler_of(task).remove(task, task.owner)
+            if removed:
+                self._space.notify()
+                return True
+
+        if task.process_safe:
+            # 已交给进程池：进程池撤销成功时会自行发出 finished 信号
+            self.process_backend.cancel(task)
+        return False
+
+    def resize(self, max_concurrent):
+        """运行时调整并发线程数；缩小时正在运行的任务照常完成，空闲线程超过 expiry 后由线程池回收"""
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent 至少为 1: {max_concurrent}")
+        with self._lock:
+            delta = max_concurrent - self.max_concurrent
+            if delta == 0:
+                return
+            self.max_concurrent = max_concurrent
+            # 保留隔离任务占用的临时线程
+            self.thread_pool.setMaxThreadCount(self.thread_pool.maxThreadCount() + delta)
+        logger.info(f"worker 线程数调整为 {max_concurrent}")
+        self._dispatch()
+
+    def utilization(self):
+        """正在运行的任务占并发上限的比例"""
+        return self._running / self.max_concurrent if self.max_concurrent else 0.0
+
+    def set_thread_expiry(self, seconds):
+        """空闲线程存活时间，超过后线程退出以释放内存"""
+        self.thread_pool.setExpiryTimeout(int(seconds * 1000))
 
-    def execute(self, task: BaseTask):
-        """执行任务"""
-        logger.debug(f"new task:{task}")
-        self.thread_pool.start(task)
+    def set_service_policy(self, owner, weight=None, quota=None):
+        """为 None 的项保持不变，quota 传入 task_scheduler.UNLIMITED 取消配额"""
+        with self._lock:
+            self.scheduler.set_policy(owner, weight, quota)
+            self.process_scheduler.set_policy(owner, weight, quota)
+        self._dispatch()
 
     def wait_for_all_done(self, timeout=-1):
-        """等待所有任务完成"""
+        """等待所有已开始的任务完成，不包含仍在排队的任务"""
         return self.thread_pool.waitForDone(timeout)
 
     def active_thread_count(self):
         """获取当前活动线程数"""
         return self.thread_pool.activeThreadCount()
 
+    def pending_count(self, owner=None):
+        """排队中的任务数，含等待子进程的任务"""
+        with self._lock:
+            return self._pending_count(owner)
+
+    def thread_pending_count(self):
+        """等待线程的任务数，不含等待子进程的任务；线程数伸缩据此判断"""
+        with self._lock:
+            return self.scheduler.pending_count()
+
+    def capacity(self):
+        """剩余可排队的任务数，不限制时返回 None；service 可据此在提交前自行限流"""
+        if self.max_pending is None:
+            return None
+        with self._lock:
+            return max(0, self.max_pending - self._pending_count())
+
+    def shutdown(self):
+        """程序退出前调用"""
+        with self._lock:
+            self.max_concurrent = 0  # 不再调度排队中的任务
+            self.max_processes = 0
+            self.max_pending = None  # 放行被阻塞的提交方
+            self._space.notify_all()
+        self.watchdog.stop()
+        self.process_backend.shutdown()
+        self.thread_pool.waitForDone()
+
+    # helpers
+    def _scheduler_of(self, task):
+        return self.process_scheduler if task.process_safe else self.scheduler
+
+    def _pending_count(self, owner=None):
+        return self.scheduler.pending_count(owner) + self.process_scheduler.pending_count(owner)
+
+    def _is_full(self):
+        return self.max_pending is not None and self._pending_count() >= self.max_pending
+
+    def _overflow(self, task, message):
+        logger.warning(f"{task}: {message}")
+        metrics.inc("task_overflow_total", policy=self.overflow_policy, task=type(task).__name__,
+                    service=task.owner or "")
+        task.emit_error(message)
+
+    def _register_owner_gauge(self, owner):
+        """按 service 统计排队深度"""
+        if owner in self._gauged_owners:
+            return
+        self._gauged_owners.add(owner)
+        metrics.register_gauge(
+            "worker_queue_depth", lambda: self.pending_count(owner), service=owner or ""
+        )
+
+    def _dispatch(self):
+        """在有空闲线程/子进程时取出任务交给线程池/进程池"""
+        ready, ready_processes = [], []
+        with self._lock:
+            while self._running < self.max_concurrent:
+                task = self.scheduler.pop()
+                if task is None:
+                    break
+                self._running += 1
+                ready.append(task)
+            while self._process_running < self.max_processes:
+                task = self.process_scheduler.pop()
+                if task is None:
+                    break
+                self._process_running += 1
+                ready_processes.append(task)
+            if ready or ready_processes:
+                self._space.notify(len(ready) + len(ready_processes))
+
+        for task in ready:
+            task.done_hook = self._on_task_done
+            if task.deadline is not None:
+                self.watchdog.watch(task)
+            self.thread_pool.start(task)
+        for task in ready_processes:
+            task.done_hook = self._on_process_done
+            self.process_backend.submit(task)
+
+    def _on_task_done(self, task):
+        """worker 线程中回调，释放名额并调度下一个任务"""
+        self.watchdog.unwatch(task)
+        with self._lock:
+            if task.quarantined:
+                # 名额已在隔离时释放，收回临时扩容的线程
+                self.thread_pool.setMaxThreadCount(self.thread_pool.maxThreadCount() - 1)
+                return
+            self._running -= 1
+            self.scheduler.task_done(task.owner)
+        self._dispatch()
+
+    def _on_process_done(self, task):
+        """进程池回调线程中调用，释放子进程名额"""
+        with self._lock:
+            self._process_running -= 1
+            self.process_scheduler.task_done(task.owner)
+        self._dispatch()
+
+    def _on_overrun(self, task, elapsed):
+        """watchdog 线程中回调"""
+        self.task_overrun.emit(task.name, elapsed)
+
+    def _quarantine(self, task):
+        """watchdog 线程中回调：视任务为失败，释放名额，丢弃其之后的结束信号"""
+        with self._lock:
+            # 与 _on_task_done 互斥，保证名额只释放一次
+            if not task.settle():
+                return  # 任务恰好已结束
+            task.quarantined = True
+            task.record_outcome("quarantine")
+            self._running -= 1
+            self.scheduler.task_done(task.owner)
+            # 被隔离的任务仍占着一个线程，临时扩容以保持可用线程数
+            self.thread_pool.setMaxThreadCount(self.thread_pool.maxThreadCount() + 1)
+
+        task.emit_error(f"任务超时: 超过 {task.deadline} 秒未结束，已隔离")
+        self._dispatch()
+
 
-worker_manager = WorkerManager()
+worker_manager = WorkerManager(
+    config["worker"]["max_concurrent"],
+    config["worker"]["aging_interval"],
+    config["worker"]["services"],
+    config["worker"]["max_processes"],
+    config["worker"]["watchdog_interval"],
+    config["worker"]["quarantine_grace"],
+    config["worker"]["max_pending"],
+    config["worker"]["overflow_policy"],
+    config["worker"]["block_timeout"],
+)
@@ -4,6 +4,8 @@ from core.base.base_task import AsyncTask
 
 
 class CrawlerBrowserTask(AsyncTask):
+    stealable = False  # 浏览器会话常驻在一个事件循环上
+
     def __init__(self, playwright, browser_config, user_data_dir):
         super().__init__("CrawlerBrowserTask")
         # type headless args
@@ -2,6 +2,7 @@ from plugins.encryptor.encryptor_controller import EncryptorController
 from plugins.encryptor.encryptor_service import EncryptorService
 from plugins.encryptor.encryptor_view import EncryptorView
 from core.utils.config_manager import config
+from core.utils.task_journal import task_journal
 
 
 class Plugin:
@@ -11,8 +12,14 @@ class Plugin:
 
         interval = config["plugins"]["encryptor"]["interval"]
         max_load = config["plugins"]["encryptor"]["max_load"]
+        adaptive = config["plugins"]["encryptor"].get("adaptive")
+        cache = config["plugins"]["encryptor"].get("cache")
+        session = config["plugins"]["encryptor"].get("session")
+        directory = config["plugins"]["encryptor"].get("directory")
+        kdf = config["plugins"]["encryptor"].get("kdf")
+        journal = task_journal if config["journal"]["enabled"] else None
 
-        self.service = EncryptorService(interval, max_load)
+        self.service = EncryptorService(interval, max_load, adaptive, cache, session, directory, journal, kdf)
         self.view = EncryptorView()
         self.controller = EncryptorController(self.view, self.service)
 
@@ -0,0 +1,262 @@
+"""
+目录加密/解密：惰性遍历目录树，按文件分片交给进程池，PBKDF2 与 AES 随核心数扩展
+
+    job = DirectoryCryptJob(password, src_dir, dst_dir)
+    job.completed.connect(on_done)
+    job.start()
+
+加密时 dst_dir 中的目录结构与 src_dir 相同，文件名追加 ENCRYPTED_SUFFIX；解密时只处理带该后缀的文件并去掉后缀
+分片：文件数达到 shard_files 或字节数达到 shard_bytes 时成片，每片在子进程中只派生一次密钥
+提交窗口：同时提交的分片不超过 max_in_flight 个，某片完成后才继续遍历并提交下一片，
+    遍历与内存占用不随目录大小增长，分片数远多于核心数时负载也能均衡
+每个文件先写入 .part 再原子替换，取消或崩溃不会留下不完整的输出
+journal 不为空时记录每个完成的文件，中断后以相同 job_id 重新启动即跳过已完成的文件
+    cancel 与崩溃一样保留日志，之后仍可恢复；abandon 取消并结束日志，任务不再可恢复
+"""
+
+import os
+import threading
+import uuid
+
+from PySide6.QtCore import QObject, Qt, Signal
+
+from core.base.base_task import TaskPriority
+from core.utils.logger import logger
+from core.utils.task_journal import TaskJournal
+from core.worker.worker_manager import worker_manager
+from plugins.encryptor.encryptor_task import DirectoryShardTask
+
+ENCRYPTED_SUFFIX = ".azf"
+
+
+class DirectoryCryptJob(QObject):
+    """
+    completed(job, success, summary) 在全部文件处理完或被取消时发出，只发出一次
+        summary = {"done": 完成数, "skipped": 跳过数, "failed": {相对路径: 错误信息}}
+        有文件失败时 success 为 False，其余文件照常处理
+    遍历完成前总数未知，进度按已发现的文件估算且不回退
+    """
+
+    progress = Signal(int)
+    completed = Signal(object, bool, object)  # job, success, summary
+
+    def __init__(self, password, src_dir, dst_dir, decrypt=False, owner="EncryptorService",
+                 shard_files=32, shard_bytes=32 << 20, max_in_flight=None,
+                 journal: TaskJournal = None, job_id=None, kdf=None):
+        """
+        max_in_flight: 同时提交的分片数，为空时取进程数的两倍
+        job_id: 恢复中断的任务时传入原 id，为空时新建
+        kdf: 加密使用的 KDF，解密时按文件头部记录的参数
+        """
+        super().__init__()
+        self.password = password
+        self.src_dir = os.path.abspath(src_dir)
+        self.dst_dir = os.path.abspath(dst_dir)
+        self.decrypt = decrypt
+        self.owner = owner
+        self.shard_files = shard_files
+        self.shard_bytes = shard_bytes
+        self.max_in_flight = max_in_flight or worker_manager.process_backend.max_workers * 2
+        self.journal = journal
+        self.job_id = job_id
+        self.kdf = kdf
+
+        self._lock = threading.Lock()
+        self._state = "idle"  # idle / running / done / cancel
+        self._files = None  # 遍历生成器
+        self._skip = {}  # 恢复时已完成的文件
+        self._running = set()
+        self._found = 0
+        self._done = 0
+        self._skipped = 0
+        self._failed = {}
+        self._last_progress = 0
+
+    def meta(self):
+        """恢复任务所需的参数，不包含密码"""
+        return {"src_dir": self.src_dir, "dst_dir": self.dst_dir, "decrypt": self.decrypt}
+
+    def start(self):
+        if not os.path.isdir(self.src_dir):
+            raise ValueError(f"{self.src_dir} 不存在或不是文件夹")
+        if _is_within(self.dst_dir, self.src_dir):
+            raise ValueError("输出目录不能位于源目录中")
+
+        with self._lock:
+            if self._state != "idle":
+                raise RuntimeError("目录任务只能启动一次")
+            self._state = "running"
+            self._files = self._walk()
+
+        if self.journal:
+            if self.job_id is None:
+                self.job_id = f"{self.owner}:dir:{uuid.uuid4().hex}"
+                self.journal.begin(self.job_id, self.meta())
+            else:
+                self._skip = self.journal.completed(self.job_id)
+
+        logger.info(f"{self} 开始 {self.src_dir} -> {self.dst_dir}")
+        self._fill()
+
+    def cancel(self):
+        """
+        未开始的分片直接撤销；子进程中正在处理的分片无法中断，会处理完当前分片，输出仍然完整
+        日志保留，之后可以相同 job_id 恢复；不再需要恢复时调用 abandon
+        """
+        self._cancel(end_journal=False)
+
+    def abandon(self):
+        """取消并结束日志，任务不会出现在未完成列表中"""
+        self._cancel(end_journal=True)
+
+    def is_running(self):
+        return self._state == "running"
+
+    # helpers
+    def _cancel(self, end_journal):
+        running = self._settle("cancel", end_journal)
+        if running is None:
+            if end_journal and self.journal and self.job_id:
+                # 已取消的任务再放弃；end 可重复调用
+                self.journal.end(self.job_id)
+            return
+
+        logger.info(f"{self} 已取消")
+        for task in running:
+            worker_manager.cancel(task)
+        self.completed.emit(self, False, self._summary())
+
+    def _walk(self):
+        """惰性遍历，产出 (源文件相对路径, 输出文件相对路径, 大小)；不跟随符号链接，跳过 .part 临时文件"""
+        stack = [self.src_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                logger.warning(f"{self}: 无法读取 {directory}：{str(e)}")
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if not entry.is_file(follow_symlinks=False) or entry.name.endswith(".part"):
+                    continue
+
+                rel = os.path.relpath(entry.path, self.src_dir)
+                if self.decrypt:
+                    if not rel.endswith(ENCRYPTED_SUFFIX):
+                        continue
+                    out = rel[:-len(ENCRYPTED_SUFFIX)]
+                else:
+                    out = rel + ENCRYPTED_SUFFIX
+                yield rel, out, entry.stat(follow_symlinks=False).st_size
+
+    def _next_shard(self):
+        """在锁内调用，遍历结束时返回 None"""
+        items, size = [], 0
+        for rel, out, file_size in self._files:
+            self._found += 1
+            if rel in self._skip:
+                self._skipped += 1
+                continue
+            items.append((rel, out))
+            size += file_size
+            if len(items) >= self.shard_files or size >= self.shard_bytes:
+                break
+        return items or None
+
+    def _fill(self):
+        """补充提交分片直到窗口填满；遍历结束且没有执行中的分片时完成"""
+        while True:
+            with self._lock:
+                if self._state != "running" or len(self._running) >= self.max_in_flight:
+                    return
+                items = self._next_shard()
+                if items is None:
+                    if self._running:
+                        return
+                    break
+                task = DirectoryShardTask(self.password, self.src_dir, self.dst_dir, items, self.decrypt, self.kdf)
+                self._running.add(task)
+            self._submit(task)
+
+        if self._settle("done") is None:
+            return  # 与 cancel 同时发生，以先到者为准
+        logger.info(f"{self} 执行完毕：完成 {self._done}，跳过 {self._skipped}，失败 {len(self._failed)}")
+        self._emit_progress()
+        self.completed.emit(self, not self._failed, self._summary())
+
+    def _submit(self, task):
+        # 回调在进程池的回调线程中执行，随即提交下一片
+        task.finished.connect(
+            lambda _task, success, result: self._on_shard_finished(task, success, result), Qt.DirectConnection
+        )
+        task.error.connect(lambda _task, message: self._on_shard_error(task, message), Qt.DirectConnection)
+        worker_manager.execute(task, owner=self.owner, priority=TaskPriority.LOW)
+
+    def _on_shard_finished(self, task, success, result):
+        if not success:
+            # 分片被单独撤销
+            self._on_shard_error(task, "已取消")
+            return
+
+        with self._lock:
+            self._running.discard(task)
+            if self._state != "running":
+                return
+            self._done += len(result["done"])
+            self._failed.update(result["failed"])
+            # 在锁内记录：_settle 改变状态后才会 end，记录不会落在已结束的任务上
+            if self.journal:
+                for rel in result["done"]:
+                    self.journal.record(self.job_id, rel)
+        self._emit_progress()
+        self._fill()
+
+    def _on_shard_error(self, task, message):
+        logger.error(f"{self}: 分片 {task} 失败：{message}")
+        with self._lock:
+            self._running.discard(task)
+            if self._state != "running":
+                return
+            self._failed.update((rel, message) for rel, _ in task.items)
+        self._emit_progress()
+        self._fill()
+
+    def _settle(self, outcome, end_journal=True):
+        """结束运行状态，返回执行中的分片；已经结束时返回 None"""
+        with self._lock:
+            if self._state != "running":
+                return None
+            self._state = outcome
+            running = list(self._running)
+        if end_journal and self.journal and self.job_id:
+            self.journal.end(self.job_id)
+        return running
+
+    def _emit_progress(self):
+        with self._lock:
+            finished = self._done + self._skipped + len(self._failed)
+            progress = 100 if self._state == "done" else int(finished / self._found * 100) if self._found else 0
+            if progress <= self._last_progress:
+                return
+            self._last_progress = progress
+        self.progress.emit(progress)
+
+    def _summary(self):
+        with self._lock:
+            return {"done": self._done, "skipped": self._skipped, "failed": dict(self._failed)}
+
+    def __str__(self):
+        return "DirectoryDecryptJob" if self.decrypt else "DirectoryEncryptJob"
+
+
+def _is_within(path, root):
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # Windows 下位于不同驱动器
+        return False
@@ -1,26 +1,209 @@
+import hashlib
+from collections import OrderedDict
+
 from core.base.base_service import BatchedService
+from core.utils.adaptive_batch import AdaptiveBatchController
 from core.utils.logger import logger
-from plugins.encryptor.encryptor_task import EncryptTask, DecryptTask
+from core.utils.task_journal import TaskJournal
+from core.worker.worker_manager import worker_manager
+from plugins.encryptor.directory_job import DirectoryCryptJob
+from plugins.encryptor.encryptor_task import EncryptTask, DecryptTask, FileCryptTask, CalibrateKdfTask
+from plugins.encryptor.utils import kdf as kdfs
+from plugins.encryptor.utils.key_cache import DerivedKeyCache
+from plugins.encryptor.utils.secure_encryptor import SecureEncryptor
 
 
 class EncryptorService(BatchedService):
     """目前只支持 utf-8 字符串加密，todo：支持其他类型数据的加密"""
 
-    def __init__(self, interval, max_load):
-        super().__init__("EncryptorService", interval, max_load)
+    use_completion_channel = True  # 大量短小请求，批量回到主线程
+
+    def __init__(self, interval, max_load, adaptive_config=None, cache_config=None, session_config=None,
+                 directory_config=None, journal: TaskJournal = None, kdf_config=None):
+        """
+        adaptive_config 不为空时按实测耗时自适应批量大小与交付间隔
+        cache_config 不为空时缓存解密结果，参数见 ResultCache
+        session_config 不为空时启用会话模式：同一密码复用一个会话加密器，只派生一次密钥
+            {"max_sessions": 会话数上限, "key_cache_size": 派生密钥缓存条数, "key_ttl": 密钥过期秒数}
+        directory_config: 目录任务的分片参数 {"shard_files", "shard_bytes", "max_in_flight"}，见 DirectoryCryptJob
+        journal 不为空时记录目录任务的进度，中断或取消后可用 resume_directory 继续，
+            不再需要的任务用 abandon_directory 丢弃
+        kdf_config: 加密使用的 KDF {"algorithm", "params", "target_seconds", "max_memory"}，
+            params 为空时在后台线程校准，使单次派生约耗时 target_seconds，结果写回 params 随配置保存，
+            下次启动不再校准；params 超出解密端接受的范围时不使用，同样重新校准
+            校准完成前（以及校准失败、被 cancel_all 取消或 kdf_config 为空时）的请求使用默认的 PBKDF2
+            （100000 次迭代），参数记录在密文头部，之后仍可正常解密
+        """
+        adaptive = AdaptiveBatchController(**adaptive_config) if adaptive_config else None
+        super().__init__("EncryptorService", interval, max_load, adaptive)
+        if cache_config:
+            self.enable_cache(**cache_config)
+
+        self.key_cache = None
+        self.max_sessions = 0
+        self._sessions = OrderedDict()  # 密码摘要 -> SecureEncryptor，LRU
+        if session_config:
+            self.key_cache = DerivedKeyCache(session_config["key_cache_size"], session_config["key_ttl"])
+            self.max_sessions = session_config["max_sessions"]
+
+        self.kdf = None
+        self.kdf_config = kdf_config
+        self._calibration = None  # 执行中的 CalibrateKdfTask
+        if kdf_config:
+            self._build_kdf()
+        self.directory_config = directory_config or {}
+        self.journal = journal
+        self.directory_jobs = []
 
     def encrypt_string(self, password: str, data: str):
         """加密数据，返回 key 和加密后的数据"""
         logger.debug(f"password={password}, data={data}")
-        task = EncryptTask(password, data)
+        task = EncryptTask(password, data, self._session(password))
         self.deliver(task)
 
     def decrypt_string(self, password: str, encrypted_data: str):
         """解密数据，返回解密后的数据"""
         logger.debug(f"password={password}, data={encrypted_data}")
-        task = DecryptTask(password, encrypted_data)
+        task = DecryptTask(password, encrypted_data, self._session(password))
         self.deliver(task)
 
+    def encrypt_file(self, password: str, src: str, dst: str):
+        """流式加密文件，内存占用与文件大小无关，完成时 task_completed 的结果为输出路径"""
+        logger.debug(f"encrypt file {src} -> {dst}")
+        self.deliver(FileCryptTask(password, src, dst, decrypt=False, encryptor=self._session(password)))
+
+    def decrypt_file(self, password: str, src: str, dst: str):
+        """流式解密文件，密文被篡改时报错且不会留下输出文件"""
+        logger.debug(f"decrypt file {src} -> {dst}")
+        self.deliver(FileCryptTask(password, src, dst, decrypt=True, encryptor=self._session(password)))
+
+    def encrypt_directory(self, password: str, src_dir: str, dst_dir: str):
+        """多进程加密整个目录树，返回 DirectoryCryptJob，可调用其 cancel；完成时 task_completed 的结果为汇总"""
+        return self._start_directory_job(password, src_dir, dst_dir, decrypt=False)
+
+    def decrypt_directory(self, password: str, src_dir: str, dst_dir: str):
+        """多进程解密 encrypt_directory 的输出目录"""
+        return self._start_directory_job(password, src_dir, dst_dir, decrypt=True)
+
+    def interrupted_directory_jobs(self):
+        """上次运行中断的目录任务 {job_id: meta}，密码不会记录，恢复时需要重新提供"""
+        if not self.journal:
+            return {}
+        prefix = f"{self.name}:dir:"
+        return {job: meta for job, meta in self.journal.unfinished().items() if job.startswith(prefix)}
+
+    def resume_directory(self, password: str, job_id: str):
+        """继续中断的目录任务，已完成的文件不再处理"""
+        meta = self.interrupted_directory_jobs()[job_id]
+        logger.info(f"恢复中断的任务 {job_id}")
+        return self._start_directory_job(password, meta["src_dir"], meta["dst_dir"], meta["decrypt"], job_id)
+
+    def abandon_directory(self, job_id: str):
+        """放弃中断或已取消的目录任务，之后不再出现在 interrupted_directory_jobs 中"""
+        for job in list(self.directory_jobs):
+            if job.job_id == job_id:
+                job.abandon()
+        if self.journal:
+            self.journal.end(job_id)
+
+    def cancel_all(self):
+        super().cancel_all()
+        for job in list(self.directory_jobs):
+            job.cancel()
+
+    def end_sessions(self):
+        """结束所有会话并清零缓存的密钥，之后的加密使用新的 salt"""
+        self._sessions.clear()
+        if self.key_cache:
+            self.key_cache.clear()
+
+    def _start_directory_job(self, password, src_dir, dst_dir, decrypt, job_id=None):
+        job = DirectoryCryptJob(password, src_dir, dst_dir, decrypt, owner=self.name,
+                                journal=self.journal, job_id=job_id, kdf=self.kdf,
+                                **self.directory_config)
+        job.progress.connect(self.on_progress_updated)
+        job.completed.connect(self.on_directory_completed)
+        # 空目录会在 start 中同步完成，先登记并发出 task_started，保证通知顺序
+        self.directory_jobs.append(job)
+        self.task_started.emit()
+        try:
+            job.start()
+        except ValueError as e:
+            self.directory_jobs.remove(job)
+            self.error_occurred.emit(str(e))
+            return None
+        return job
+
+    def on_directory_completed(self, job, success, summary):
+        if job in self.directory_jobs:
+            self.directory_jobs.remove(job)
+        self.task_completed.emit(success, summary)
+
+    def on_task_finished(self, task, success, result):
+        if task is self._calibration:
+            self._end_calibration()
+            if success:
+                self._apply_kdf(result)
+            else:
+                logger.warning("KDF 校准已取消，继续使用默认参数")
+            return
+        super().on_task_finished(task, success, result)
+
+    def on_task_error(self, task, message):
+        if task is self._calibration:
+            self._end_calibration()
+            logger.error(f"KDF 校准失败，继续使用默认参数：{message}")
+            return
+        super().on_task_error(task, message)
+
+    def _build_kdf(self):
+        if self.kdf_config.get("params") is not None:
+            try:
+                self.kdf = kdfs.from_config(self.kdf_config["algorithm"], self.kdf_config["params"])
+                return
+            except ValueError as e:
+                logger.error(f"配置的 KDF 参数不可用，重新校准：{str(e)}")
+
+        # 校准不经过批量与 service 的对外信号，只登记到 active_tasks 以便 cancel_all 撤销
+        task = CalibrateKdfTask(self.kdf_config["algorithm"], self.kdf_config["target_seconds"],
+                                self.kdf_config["max_memory"])
+        self._calibration = task
+        self.active_tasks.append(task)
+        task.finished.connect(self.on_task_finished)
+        task.error.connect(self.on_task_error)
+        worker_manager.execute(task, owner=self.name)
+
+    def _end_calibration(self):
+        task, self._calibration = self._calibration, None
+        task.finished.disconnect(self.on_task_finished)
+        task.error.disconnect(self.on_task_error)
+        self.active_tasks.remove(task)
+
+    def _apply_kdf(self, kdf):
+        logger.info(f"KDF 校准结果: {kdf}")
+        self.kdf = kdf
+        # 已有的会话加密器仍使用默认 KDF，丢弃后按新参数重建
+        self._sessions.clear()
+        # kdf_config 即配置中的 dict，退出时随配置保存
+        self.kdf_config["params"] = kdf.config_params()
+
+    def _session(self, password):
+        """按密码复用会话加密器，未启用会话模式时每次新建"""
+        if not self.max_sessions:
+            return SecureEncryptor(password, kdf=self.kdf)
+
+        digest = hashlib.sha256(password.encode()).digest()
+        encryptor = self._sessions.get(digest)
+        if encryptor is None:
+            encryptor = SecureEncryptor(password, session=True, key_cache=self.key_cache, kdf=self.kdf)
+            self._sessions[digest] = encryptor
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(digest)
+        return encryptor
+
     def load_size(self, task):
-        # todo: 更智能化的评估方式
+        if self.adaptive:
+            return super().load_size(task)
         return 10
\ No newline at end of file
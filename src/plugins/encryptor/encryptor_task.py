@@ -1,28 +1,48 @@
-from core.base.base_task import BaseTask
+import hashlib
+import os
+
+from core.base.base_task import BaseTask, ProcessTask, TaskPriority
+from plugins.encryptor.utils import kdf as kdfs
 from plugins.encryptor.utils.secure_encryptor import SecureEncryptor
 
 """service 只返回 str 给 controller"""
 
 
 class EncryptTask(BaseTask):
-    def __init__(self, password, data):
+    priority = TaskPriority.HIGH  # 用户交互触发
+
+    def __init__(self, password, data, encryptor: SecureEncryptor = None):
+        """encryptor 为空时单独创建，每次都要完整派生密钥；service 会传入按密码复用的会话加密器"""
         super().__init__("EncryptTask")
-        self.encryptor = SecureEncryptor(password)
+        self.encryptor = encryptor or SecureEncryptor(password)
         self.data = data  # 可以是 str 或 bytes
         self.result = None
 
+    def dedup_key(self):
+        """重复点击时合并，任一密文都能解密出原文"""
+        return "encrypt:" + _digest(self.encryptor.password, self.data)
+
     def execute(self):
         self.result = self.encryptor.encrypt(self.data)
         return self.result.decode()
 
 
 class DecryptTask(BaseTask):
-    def __init__(self, password, encrypted_data):
+    priority = TaskPriority.HIGH
+
+    def __init__(self, password, encrypted_data, encryptor: SecureEncryptor = None):
         super().__init__("DecryptTask")
-        self.encryptor = SecureEncryptor(password)
+        self.encryptor = encryptor or SecureEncryptor(password)
         self.data = encrypted_data  # base64编码后的加密数据
         self.result = None
 
+    def cache_key(self):
+        """相同密码与密文的解密结果相同"""
+        return "decrypt:" + _digest(self.encryptor.password, self.data)
+
+    def dedup_key(self):
+        return self.cache_key()
+
     def execute(self):
         try:
             decrypted = self.encryptor.decrypt_to_string(self.data)
@@ -31,3 +51,93 @@ class DecryptTask(BaseTask):
         except Exception as e:
             print(f"解密失败: {e}")
             return None
+
+
+class FileCryptTask(BaseTask):
+    """流式加密/解密单个文件，按字节数汇报进度，返回输出路径"""
+
+    batchable = False  # 大文件耗时长，且需要单独的进度
+
+    def __init__(self, password, src, dst, decrypt=False, encryptor: SecureEncryptor = None):
+        super().__init__("FileDecryptTask" if decrypt else "FileEncryptTask")
+        self.encryptor = encryptor or SecureEncryptor(password)
+        self.src = os.path.abspath(src)
+        self.dst = os.path.abspath(dst)
+        self.decrypt = decrypt
+
+    def execute(self):
+        if self.decrypt:
+            self.encryptor.decrypt_file(self.src, self.dst, self._on_progress, self.check_cancelled)
+        else:
+            self.encryptor.encrypt_file(self.src, self.dst, on_progress=self._on_progress,
+                                        check_cancelled=self.check_cancelled)
+        return self.dst
+
+    def _on_progress(self, done, total):
+        self.report_progress(int(done / total * 100) if total else 100)
+
+
+class DirectoryShardTask(ProcessTask):
+    """
+    在子进程中加密/解密目录中的一组文件，单个文件失败不影响其余文件
+    加密时整个分片共用一个 salt，只派生一次密钥，每个文件仍使用随机的 nonce 前缀；
+    解密时文件头中的 salt 相同的文件（同一分片加密）命中加密器的密钥缓存
+    返回 {"done": [相对路径], "failed": [[相对路径, 错误信息]]}
+    """
+
+    priority = TaskPriority.LOW
+
+    def __init__(self, password, src_dir, dst_dir, items, decrypt=False, kdf=None):
+        """items: [(源文件相对路径, 输出文件相对路径)]；kdf 为加密使用的 KDF，为空时使用默认参数"""
+        super().__init__("DirectoryDecryptShard" if decrypt else "DirectoryEncryptShard")
+        self.password = password
+        self.src_dir = src_dir
+        self.dst_dir = dst_dir
+        self.items = items
+        self.decrypt = decrypt
+        self.kdf = kdf
+
+    def get_state(self):
+        return self.password, self.src_dir, self.dst_dir, self.items, self.decrypt, self.kdf
+
+    @staticmethod
+    def execute_in_process(state, report_progress):
+        password, src_dir, dst_dir, items, decrypt, kdf = state
+        encryptor = SecureEncryptor(password, session=True, kdf=kdf)
+        done, failed = [], []
+        for src_rel, dst_rel in items:
+            src = os.path.join(src_dir, src_rel)
+            dst = os.path.join(dst_dir, dst_rel)
+            try:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                if decrypt:
+                    encryptor.decrypt_file(src, dst)
+                else:
+                    encryptor.encrypt_file(src, dst)
+                done.append(src_rel)
+            except Exception as e:
+                failed.append([src_rel, f"{type(e).__name__}: {e}"])
+        return {"done": done, "failed": failed}
+
+
+class CalibrateKdfTask(BaseTask):
+    """在本机校准 KDF 参数，耗时约为数次派生，不能在 GUI 线程执行；返回校准后的 KDF"""
+
+    priority = TaskPriority.LOW
+    batchable = False
+
+    def __init__(self, algorithm, target_seconds, max_memory):
+        super().__init__("CalibrateKdfTask")
+        self.algorithm = algorithm
+        self.target_seconds = target_seconds
+        self.max_memory = max_memory
+
+    def execute(self):
+        return kdfs.calibrate(self.algorithm, self.target_seconds, self.max_memory)
+
+
+def _digest(password: bytes, data):
+    """缓存/合并键只保留摘要，不保存明文密码与数据"""
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(password + b"\0" + data).hexdigest()
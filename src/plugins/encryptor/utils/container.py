@@ -0,0 +1,73 @@
+"""
+加密数据的二进制容器（v3），头部自描述，解密不依赖加密器的当前参数
+
+    MAGIC(3) + version(1) + kdf_id(1) + len(1) + kdf_params + len(1) + salt + nonce(12) + AEAD 密文
+nonce 之前的部分作为附加认证数据，头部任一字节被改动都会校验失败
+解析只在 memoryview 上切片，不复制密文；文本传输时可再加一层 urlsafe base64（armor）
+"""
+
+import base64
+import struct
+from typing import NamedTuple
+
+MAGIC = b"AZE"
+VERSION = 3
+NONCE_SIZE = 12
+
+
+class Container(NamedTuple):
+    kdf_id: int  # 见 kdf.KDFS
+    kdf_params: memoryview
+    salt: memoryview
+    nonce: memoryview
+    header: memoryview  # 附加认证数据
+    ciphertext: memoryview
+
+
+def build_header(kdf_id: int, kdf_params: bytes, salt: bytes) -> bytes:
+    return b"".join((
+        MAGIC, struct.pack(">BBB", VERSION, kdf_id, len(kdf_params)), kdf_params,
+        struct.pack(">B", len(salt)), salt,
+    ))
+
+
+def pack(header: bytes, nonce: bytes, ciphertext: bytes) -> bytes:
+    return b"".join((header, nonce, ciphertext))
+
+
+def is_container(data) -> bool:
+    """二进制容器；armor 后的文本中不会出现版本字节，可据此区分"""
+    return bytes(data[:len(MAGIC) + 1]) == MAGIC + bytes([VERSION])
+
+
+def parse(data) -> Container:
+    """data 为 bytes-like，返回的各字段均为 data 上的 memoryview"""
+    view = memoryview(data)
+    if not is_container(view):
+        raise ValueError("不是 v3 加密数据")
+
+    pos = len(MAGIC) + 1
+    try:
+        kdf_id, params_size = view[pos], view[pos + 1]
+        pos += 2
+        kdf_params = view[pos:pos + params_size]
+        pos += params_size
+        salt_size = view[pos]
+        pos += 1
+    except IndexError:
+        raise ValueError("加密数据不完整") from None
+
+    salt = view[pos:pos + salt_size]
+    pos += salt_size
+    nonce = view[pos:pos + NONCE_SIZE]
+    if len(kdf_params) != params_size or len(salt) != salt_size or len(nonce) != NONCE_SIZE:
+        raise ValueError("加密数据不完整")
+    return Container(kdf_id, kdf_params, salt, nonce, view[:pos], view[pos + NONCE_SIZE:])
+
+
+def armor(blob: bytes) -> bytes:
+    return base64.urlsafe_b64encode(blob)
+
+
+def dearmor(token) -> bytes:
+    return base64.urlsafe_b64decode(token)
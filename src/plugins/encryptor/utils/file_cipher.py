@@ -0,0 +1,149 @@
+"""
+分块流式文件加密，内存占用与文件大小无关
+
+文件格式：
+    v2 header = FILE_MAGIC + version + kdf_id(1) + len(1) + kdf_params + len(1) + salt + nonce_prefix(7) + chunk_size(4, 大端)
+    v1 header = FILE_MAGIC + version + salt + nonce_prefix(7) + chunk_size(4, 大端)，只用于解密，KDF 由调用方给出
+    之后是若干密文块，每块为 AES-GCM(明文块) + 16 字节 tag，最后一块可以短于 chunk_size 或为空
+每块的 nonce = nonce_prefix + 块序号(4, 大端) + 是否最后一块(1)，header 作为附加认证数据（STREAM 构造）：
+    块被篡改、重排、截断或在末尾追加都会在对应块校验失败
+读取复用两个固定大小的缓冲区，借助预读判断最后一块
+输出先写入 <dst>.part，成功后原子替换为 dst，失败或取消时删除
+"""
+
+import os
+import struct
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from plugins.encryptor.utils import kdf as kdfs
+
+FILE_MAGIC = b"AZF"
+FILE_VERSION = 2
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1 << 20
+MAX_CHUNK_SIZE = 64 << 20  # header 在首块校验前不可信，限制据其分配的缓冲区大小
+
+
+def encrypt_file(derive_key, kdf, salt, src, dst, chunk_size=DEFAULT_CHUNK_SIZE, on_progress=None,
+                 check_cancelled=None):
+    """
+    derive_key(salt, kdf) 返回 32 字节密钥，kdf 的 id 与参数写入 header
+    on_progress(已处理字节数, 总字节数)；check_cancelled() 在每块之前调用，取消时应抛出异常
+    """
+    nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+    header = b"".join((
+        FILE_MAGIC, struct.pack(">BBB", FILE_VERSION, kdf.kdf_id, len(kdf.params())), kdf.params(),
+        struct.pack(">B", len(salt)), salt, nonce_prefix, struct.pack(">I", chunk_size),
+    ))
+    aead = AESGCM(derive_key(salt, kdf))
+    total = os.path.getsize(src)
+
+    def write_chunks(fin, fout):
+        fout.write(header)
+        done = 0
+        for index, chunk, last in _read_chunks(fin, chunk_size, check_cancelled):
+            fout.write(aead.encrypt(_nonce(nonce_prefix, index, last), chunk, header))
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, total)
+
+    _atomic_transform(src, dst, write_chunks)
+
+
+def decrypt_file(derive_key, legacy_kdf, salt_size, src, dst, on_progress=None, check_cancelled=None):
+    """
+    v2 按 header 中的 KDF 派生密钥；v1 使用 legacy_kdf 与固定长度 salt_size
+    密文被篡改或截断时抛出 InvalidTag，不会留下部分解密的文件
+    """
+    total = os.path.getsize(src)
+
+    def write_chunks(fin, fout):
+        header, salt, kdf = _read_header(fin, legacy_kdf, salt_size)
+        view = memoryview(header)
+        nonce_prefix = bytes(view[-4 - NONCE_PREFIX_SIZE:-4])
+        chunk_size, = struct.unpack(">I", view[-4:])
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"块大小无效: {chunk_size}")
+        aead = AESGCM(derive_key(salt, kdf))
+
+        done = len(header)
+        for index, chunk, last in _read_chunks(fin, chunk_size + TAG_SIZE, check_cancelled):
+            # 最后一块以 last=1 认证，缺失或截断时这里校验失败
+            fout.write(aead.decrypt(_nonce(nonce_prefix, index, last), chunk, header))
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, total)
+
+    _atomic_transform(src, dst, write_chunks)
+
+
+def is_encrypted_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(FILE_MAGIC)) == FILE_MAGIC
+
+
+# helpers
+def _read_header(fin, legacy_kdf, salt_size):
+    """返回 (header, salt, kdf)"""
+    def read(size):
+        data = fin.read(size)
+        if len(data) != size:
+            raise ValueError("不是加密文件")
+        return data
+
+    header = read(len(FILE_MAGIC) + 1)
+    if header[:len(FILE_MAGIC)] != FILE_MAGIC:
+        raise ValueError("不是加密文件")
+
+    version = header[len(FILE_MAGIC)]
+    if version == 1:
+        header += read(salt_size + NONCE_PREFIX_SIZE + 4)
+        return header, header[len(FILE_MAGIC) + 1:len(FILE_MAGIC) + 1 + salt_size], legacy_kdf
+    if version != FILE_VERSION:
+        raise ValueError(f"不支持的文件版本: {version}")
+
+    header += read(2)
+    kdf_params = read(header[-1])
+    kdf = kdfs.from_header(header[-2], kdf_params)
+    header += kdf_params + read(1)
+    salt = read(header[-1])
+    header += salt + read(NONCE_PREFIX_SIZE + 4)
+    return header, salt, kdf
+
+
+def _nonce(prefix, index, last):
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+def _read_chunks(fin, size, check_cancelled):
+    """逐块产出 (序号, memoryview, 是否最后一块)，两个缓冲区交替使用，产出的 memoryview 在下一次迭代前有效"""
+    buffers = [bytearray(size), bytearray(size)]
+    current = memoryview(buffers[0])[:fin.readinto(buffers[0])]
+    index = 0
+    while True:
+        if check_cancelled:
+            check_cancelled()
+        spare = buffers[(index + 1) % 2]
+        n = fin.readinto(spare)
+        last = n == 0
+        yield index, current, last
+        if last:
+            return
+        current = memoryview(spare)[:n]
+        index += 1
+
+
+def _atomic_transform(src, dst, write_chunks):
+    tmp_path = dst + ".part"
+    try:
+        with open(src, "rb") as fin, open(tmp_path, "wb") as fout:
+            write_chunks(fin, fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
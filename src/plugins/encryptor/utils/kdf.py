@@ -0,0 +1,195 @@
+"""
+可插拔的密钥派生函数，参数编码在密文头部（见 container），解密时按头部还原，与加密端的当前配置无关
+
+    kdf = calibrate("scrypt", target_seconds=0.2)
+    encryptor = SecureEncryptor(password, kdf=kdf)
+
+头部参数在认证前不可信，from_params 会限制参数范围，避免构造的密文触发超长耗时或超大内存的派生
+from_config 做同样的检查并要求不低于下限，保证按配置加密的密文一定能被解密端接受
+"""
+
+import struct
+import time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+KEY_SIZE = 32
+
+
+class Pbkdf2Kdf:
+    kdf_id = 1
+    name = "pbkdf2-sha256"
+
+    MIN_ITERATIONS = 10_000
+    MAX_ITERATIONS = 10_000_000
+
+    def __init__(self, iterations=100_000):
+        self.iterations = iterations
+
+    def derive(self, password: bytes, salt: bytes) -> bytes:
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=KEY_SIZE,
+            salt=salt,
+            iterations=self.iterations,
+            backend=default_backend()
+        )
+        return kdf.derive(password)
+
+    def params(self) -> bytes:
+        return struct.pack(">I", self.iterations)
+
+    @classmethod
+    def from_params(cls, params):
+        if len(params) != 4:
+            raise ValueError("PBKDF2 参数长度无效")
+        iterations, = struct.unpack(">I", params)
+        kdf = cls(iterations)
+        kdf.validate()
+        return kdf
+
+    def validate(self, strict=False):
+        """参数超出范围时抛出 ValueError；strict 时同时检查下限，用于加密端的配置"""
+        low = self.MIN_ITERATIONS if strict else 1
+        if not isinstance(self.iterations, int) or not low <= self.iterations <= self.MAX_ITERATIONS:
+            raise ValueError(f"KDF 参数无效: iterations={self.iterations}")
+
+    def memory_bytes(self):
+        return 0
+
+    def config_params(self):
+        """写入配置的构造参数，见 from_config"""
+        return {"iterations": self.iterations}
+
+    def cache_params(self):
+        """参与派生密钥缓存的键"""
+        return self.name, self.iterations
+
+    def __repr__(self):
+        return f"{self.name}(iterations={self.iterations})"
+
+
+class ScryptKdf:
+    """内存困难的 KDF，内存占用约 128 * n * r 字节，p 份并行计算依次执行，耗时随 p 线性增长"""
+
+    kdf_id = 2
+    name = "scrypt"
+
+    # 头部参数的上限：单个伪造的密文最多占用 MAX_MEMORY 内存、做 MAX_WORK（n * r * p）的计算
+    MIN_LOG2_N = 14
+    MAX_LOG2_N = 18
+    MAX_R = 32
+    MAX_P = 4
+    MAX_MEMORY = 256 << 20
+    MAX_WORK = 1 << 22
+
+    def __init__(self, log2_n=15, r=8, p=1):
+        self.log2_n = log2_n
+        self.r = r
+        self.p = p
+
+    def derive(self, password: bytes, salt: bytes) -> bytes:
+        kdf = Scrypt(salt=salt, length=KEY_SIZE, n=1 << self.log2_n, r=self.r, p=self.p, backend=default_backend())
+        return kdf.derive(password)
+
+    def params(self) -> bytes:
+        return struct.pack(">BBB", self.log2_n, self.r, self.p)
+
+    @classmethod
+    def from_params(cls, params):
+        if len(params) != 3:
+            raise ValueError("scrypt 参数长度无效")
+        kdf = cls(*struct.unpack(">BBB", params))
+        kdf.validate()
+        return kdf
+
+    def validate(self, strict=False):
+        """下限与头部解析时相同，strict 只为与 Pbkdf2Kdf 接口一致"""
+        if not all(isinstance(v, int) for v in (self.log2_n, self.r, self.p)):
+            raise ValueError(f"KDF 参数无效: {self}")
+        if (not self.MIN_LOG2_N <= self.log2_n <= self.MAX_LOG2_N or not 1 <= self.r <= self.MAX_R
+                or not 1 <= self.p <= self.MAX_P or self.memory_bytes() > self.MAX_MEMORY
+                or (1 << self.log2_n) * self.r * self.p > self.MAX_WORK):
+            raise ValueError(f"KDF 参数无效: {self}")
+
+    def memory_bytes(self):
+        return 128 * (1 << self.log2_n) * self.r
+
+    def config_params(self):
+        return {"log2_n": self.log2_n, "r": self.r, "p": self.p}
+
+    def cache_params(self):
+        return self.name, self.log2_n, self.r, self.p
+
+    def __repr__(self):
+        return f"{self.name}(n=2^{self.log2_n}, r={self.r}, p={self.p})"
+
+
+KDFS = {kdf.kdf_id: kdf for kdf in (Pbkdf2Kdf, ScryptKdf)}
+KDFS_BY_NAME = {kdf.name: kdf for kdf in (Pbkdf2Kdf, ScryptKdf)}
+
+
+def from_header(kdf_id, params):
+    """按密文头部记录的 id 与参数还原 KDF"""
+    kdf_cls = KDFS.get(kdf_id)
+    if kdf_cls is None:
+        raise ValueError(f"不支持的 KDF: {kdf_id}")
+    return kdf_cls.from_params(params)
+
+
+def from_config(name, params=None):
+    """params 为构造参数的 dict，如 {"iterations": 200000}；为空时使用默认参数；参数无效时抛出 ValueError"""
+    kdf_cls = KDFS_BY_NAME.get(name)
+    if kdf_cls is None:
+        raise ValueError(f"未知的 KDF: {name}")
+    try:
+        kdf = kdf_cls(**(params or {}))
+    except TypeError as e:
+        raise ValueError(f"KDF 参数无效: {params}") from e
+    kdf.validate(strict=True)
+    return kdf
+
+
+def measure(kdf, rounds=1):
+    """单次派生的平均耗时（秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        kdf.derive(b"calibration", bytes(16))
+    return (time.perf_counter() - start) / rounds
+
+
+def calibrate(name, target_seconds=0.2, max_memory=64 << 20):
+    """
+    在本机测量派生耗时，返回单次派生最接近且不超过 target_seconds 的参数，不低于各 KDF 的下限
+    PBKDF2：耗时与迭代次数成正比，按一次试算线性外推后再修正一次
+    scrypt：r=8, p=1，n 从下限开始翻倍，内存不超过 max_memory
+    """
+    if name == Pbkdf2Kdf.name:
+        probe = Pbkdf2Kdf(Pbkdf2Kdf.MIN_ITERATIONS)
+        kdf = Pbkdf2Kdf(_scale_iterations(probe.iterations, measure(probe), target_seconds))
+        kdf.iterations = _scale_iterations(kdf.iterations, measure(kdf), target_seconds)
+        return kdf
+
+    if name == ScryptKdf.name:
+        kdf = ScryptKdf(ScryptKdf.MIN_LOG2_N)
+        elapsed = measure(kdf)
+        while kdf.log2_n < ScryptKdf.MAX_LOG2_N:
+            candidate = ScryptKdf(kdf.log2_n + 1, kdf.r, kdf.p)
+            # 耗时与 n 近似成正比，预计超出目标时不再实测
+            if candidate.memory_bytes() > max_memory or elapsed * 2 > target_seconds:
+                break
+            kdf, elapsed = candidate, measure(candidate)
+        return kdf
+
+    raise ValueError(f"未知的 KDF: {name}")
+
+
+# helpers
+def _scale_iterations(iterations, elapsed, target_seconds):
+    scaled = int(iterations * target_seconds / max(elapsed, 1e-6))
+    # 取整到千，便于阅读
+    scaled = scaled // 1000 * 1000
+    return max(Pbkdf2Kdf.MIN_ITERATIONS, min(Pbkdf2Kdf.MAX_ITERATIONS, scaled))
@@ -0,0 +1,66 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class DerivedKeyCache:
+    """
+    派生密钥缓存：LRU + TTL，键为 (密码摘要, salt, KDF 参数)，不保存明文密码
+    密钥保存在 bytearray 中，淘汰、过期或 clear 时原地清零
+    Python 无法保证内存中不存在其他副本（如传给 cryptography 的临时 bytes），清零只是尽力而为
+    """
+
+    def __init__(self, max_entries=64, ttl=600):
+        """ttl: 过期秒数，None 表示不过期"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (bytearray, expire_at)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(password: bytes, salt: bytes, params) -> tuple:
+        return hashlib.sha256(password).digest(), bytes(salt), params
+
+    def get_or_derive(self, key, derive):
+        """
+        命中时返回缓存的密钥，否则调用 derive() 派生并缓存
+        返回 bytes 副本：其他线程淘汰并清零缓存中的密钥时，正在使用的副本不受影响
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expire_at = entry
+                if expire_at is None or expire_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return bytes(value)
+                self._evict(key)
+            self.misses += 1
+
+        # 派生很慢，不持有锁；并发的首次派生可能重复计算，结果相同
+        value = bytearray(derive())
+        expire_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (value, expire_at)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+            return bytes(value)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # helpers
+    def _evict(self, key):
+        value, _ = self._entries.pop(key)
+        value[:] = bytes(len(value))
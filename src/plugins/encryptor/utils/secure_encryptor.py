@@ -1,71 +1,134 @@
 import os
 import base64
 from typing import Union
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
 
+from plugins.encryptor.utils import container, file_cipher, kdf as kdfs
+from plugins.encryptor.utils.container import MAGIC, NONCE_SIZE
+from plugins.encryptor.utils.key_cache import DerivedKeyCache
+
+# 密文格式
+# v1（旧）：urlsafe_b64(salt + Fernet token)，只用于解密
+# v2（旧）：urlsafe_b64(MAGIC + version + salt + nonce + AES-GCM 密文)，只用于解密
+# v3：二进制容器，头部记录 KDF 及其参数，格式见 container；默认再加一层 urlsafe base64
+VERSION_V2 = 2
+
 
 class SecureEncryptor:
-    def __init__(self, password: str, iterations: int = 100_000, salt_size: int = 16):
+    def __init__(self, password: str, iterations: int = 100_000, salt_size: int = 16,
+                 session: bool = False, key_cache: DerivedKeyCache = None, kdf=None):
         """
         初始化加密器
         :param password: 用户提供的任意长度密钥
-        :param iterations: KDF迭代次数
+        :param iterations: PBKDF2 迭代次数，kdf 为空时使用；旧格式的密文总是按它解密
         :param salt_size: 盐的长度
+        :param session: 会话模式，整个加密器只生成一个 salt、派生一次密钥，每条消息使用随机 nonce；
+            否则每条消息使用新的 salt，都要完整派生一次
+        :param key_cache: 派生密钥缓存，可在多个加密器间共享；为空时使用私有的小缓存
+        :param kdf: 加密使用的 KDF，见 kdf 模块，如 calibrate 的结果；解密 v3 时按密文头部的参数
         """
         self.password = password.encode()
-        self.iterations = iterations
+        self.legacy_kdf = kdfs.Pbkdf2Kdf(iterations)
+        self.kdf = kdf or self.legacy_kdf
         self.salt_size = salt_size
+        self.key_cache = key_cache if key_cache is not None else DerivedKeyCache(max_entries=4)
+        self._session_salt = os.urandom(salt_size) if session else None
 
-    def _derive_key(self, salt: bytes) -> bytes:
+    def _derive_key(self, salt: bytes, kdf=None) -> bytes:
         """
-        根据密码和盐派生密钥
+        根据密码和盐派生 32 字节密钥，相同参数的结果由 key_cache 缓存
+        kdf 为空时使用加密器自身的 KDF，解密时使用密文头部记录的 KDF
         """
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=self.iterations,
-            backend=default_backend()
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(self.password))
-        return key
-
-    def encrypt(self, data: Union[str, bytes]) -> bytes:
+        kdf = kdf or self.kdf
+        key = DerivedKeyCache.make_key(self.password, salt, kdf.cache_params())
+        return self.key_cache.get_or_derive(key, lambda: kdf.derive(self.password, salt))
+
+    def encrypt(self, data: Union[str, bytes], armor: bool = True) -> bytes:
         """
         加密数据（支持字符串和字节）
-        :return: 返回包含盐和密文的整体字节流
+        :param armor: 为 True 时返回 urlsafe base64 文本，否则返回二进制容器，体积约为文本的 3/4
+        :return: 返回 v3 格式的密文
         """
         if isinstance(data, str):
             data = data.encode()
 
-        salt = os.urandom(self.salt_size)
-        key = self._derive_key(salt)
-        fernet = Fernet(key)
-        token = fernet.encrypt(data)
+        salt = self._session_salt or os.urandom(self.salt_size)
+        header = container.build_header(self.kdf.kdf_id, self.kdf.params(), salt)
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = AESGCM(self._derive_key(salt)).encrypt(nonce, data, header)
+        blob = container.pack(header, nonce, ciphertext)
+        return container.armor(blob) if armor else blob
 
-        # 将 salt + token 组合一起返回，方便解密时使用
-        return base64.urlsafe_b64encode(salt + token)
-
-    def decrypt(self, token: Union[str, bytes]) -> bytes:
+    def decrypt(self, token: Union[str, bytes, bytearray, memoryview]) -> bytes:
         """
-        解密数据（返回字节）
+        解密数据（返回字节），同时支持二进制与文本形式的 v3 以及旧格式
         """
         if isinstance(token, str):
             token = token.encode()
 
-        decoded = base64.urlsafe_b64decode(token)
-        salt = decoded[:self.salt_size]
-        real_token = decoded[self.salt_size:]
-
-        key = self._derive_key(salt)
-        fernet = Fernet(key)
-        return fernet.decrypt(real_token)
+        decoded = token if container.is_container(token) else container.dearmor(token)
+        if container.is_container(decoded):
+            return self._fallback_v1(self._decrypt_v3, decoded)
+        if decoded[:len(MAGIC)] == MAGIC and decoded[len(MAGIC)] == VERSION_V2:
+            return self._fallback_v1(self._decrypt_v2, decoded)
+        return self._decrypt_v1(decoded)
 
     def decrypt_to_string(self, token: Union[str, bytes]) -> str:
         """
         解密并返回字符串
         """
         return self.decrypt(token).decode()
+
+    def encrypt_file(self, src: str, dst: str, chunk_size: int = file_cipher.DEFAULT_CHUNK_SIZE,
+                     on_progress=None, check_cancelled=None):
+        """
+        分块流式加密文件，内存占用约为两个 chunk_size，格式见 file_cipher
+        :param on_progress: on_progress(已处理字节数, 总字节数)
+        :param check_cancelled: 每块之前调用，抛出异常即中止，不会留下不完整的输出
+        """
+        salt = self._session_salt or os.urandom(self.salt_size)
+        file_cipher.encrypt_file(self._derive_key, self.kdf, salt, src, dst, chunk_size, on_progress,
+                                 check_cancelled)
+
+    def decrypt_file(self, src: str, dst: str, on_progress=None, check_cancelled=None):
+        """
+        分块流式解密文件，任一块校验失败时抛出 InvalidTag
+        """
+        file_cipher.decrypt_file(self._derive_key, self.legacy_kdf, self.salt_size, src, dst, on_progress,
+                                 check_cancelled)
+
+    # helpers
+    def _fallback_v1(self, decrypt, decoded):
+        """旧格式的随机 salt 恰好以 MAGIC + version 开头的极小概率情况，按旧格式再试一次"""
+        try:
+            return decrypt(decoded)
+        except (InvalidTag, ValueError):
+            try:
+                return self._decrypt_v1(decoded)
+            except Exception:
+                pass
+            raise
+
+    def _decrypt_v3(self, decoded) -> bytes:
+        parsed = container.parse(decoded)
+        kdf = kdfs.from_header(parsed.kdf_id, parsed.kdf_params)
+        key = self._derive_key(bytes(parsed.salt), kdf)
+        return AESGCM(key).decrypt(parsed.nonce, parsed.ciphertext, parsed.header)
+
+    def _decrypt_v2(self, decoded: bytes) -> bytes:
+        view = memoryview(decoded)
+        header_size = len(MAGIC) + 1 + self.salt_size
+        header = view[:header_size]
+        salt = bytes(header[len(MAGIC) + 1:])
+        nonce = view[header_size:header_size + NONCE_SIZE]
+        ciphertext = view[header_size + NONCE_SIZE:]
+        return AESGCM(self._derive_key(salt, self.legacy_kdf)).decrypt(nonce, ciphertext, header)
+
+    def _decrypt_v1(self, decoded: bytes) -> bytes:
+        salt = bytes(decoded[:self.salt_size])
+        real_token = bytes(decoded[self.salt_size:])
+
+        fernet = Fernet(base64.urlsafe_b64encode(self._derive_key(salt, self.legacy_kdf)))
+        return fernet.decrypt(real_token)
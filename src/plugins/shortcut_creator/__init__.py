@@ -2,6 +2,7 @@ from plugins.shortcut_creator.shortcut_creator_controller import ShortcutCreator
 from plugins.shortcut_creator.shortcut_creator_service import ShortcutCreatorService
 from plugins.shortcut_creator.shortcut_creator_view import ShortcutCreatorView
 from core.utils.config_manager import config
+from core.utils.task_journal import task_journal
 
 
 # 在 target_dir 下为 file_paths 中的每个文件创建快捷方式
@@ -17,8 +18,10 @@ class Plugin:
         default_target_dir = config["plugins"]["shortcut_creator"]["default_target_dir"]
 
         self.view = ShortcutCreatorView(default_selected_dir, default_target_dir)
-        self.service = ShortcutCreatorService()
+        self.service = ShortcutCreatorService(task_journal if config["journal"]["enabled"] else None)
         self.controller = ShortcutCreatorController(self.view, self.service)
+        # controller 连接信号后再恢复，进度与结果照常显示
+        self.service.resume_interrupted()
 
     def get_widget(self):
         return self.view
@@ -1,20 +1,56 @@
 import os
+import uuid
 
 from plugins.shortcut_creator.shortcut_creator_task import ShortcutCreationTask
 from core.base.base_service import BaseService
+from core.utils.logger import logger
+from core.utils.task_journal import TaskJournal
 
 
 class ShortcutCreatorService(BaseService):
     """负责处理业务逻辑协调、任务管理和结果处理"""
 
-    def __init__(self):
+    progress_max_rate = 10  # 进度条刷新足够平滑即可
+
+    def __init__(self, journal: TaskJournal = None):
         super().__init__("ShortcutCreatorService")
+        self.journal = journal  # 为空时不记录，中断后无法恢复
 
     def create_shortcuts(self, target_dir, file_paths):
         """创建快捷方式任务"""
-        task = ShortcutCreationTask(target_dir, file_paths)
+        job_id = None
+        if self.journal:
+            job_id = f"{self.name}:{uuid.uuid4().hex}"
+            self.journal.begin(job_id, {"target_dir": target_dir, "file_paths": list(file_paths)})
+
+        task = ShortcutCreationTask(target_dir, file_paths, self.journal, job_id)
         self.deliver(task)
 
+    def resume_interrupted(self):
+        """恢复上次运行中断的任务，返回恢复的任务数"""
+        if not self.journal:
+            return 0
+
+        jobs = {job: meta for job, meta in self.journal.unfinished().items() if job.startswith(f"{self.name}:")}
+        for job_id, meta in jobs.items():
+            logger.info(f"恢复中断的任务 {job_id}")
+            self.deliver(ShortcutCreationTask(meta["target_dir"], meta["file_paths"], self.journal, job_id,
+                                              resumed=True))
+        return len(jobs)
+
+    def on_task_finished(self, task, success, result):
+        self._end_job(task)
+        super().on_task_finished(task, success, result)
+
+    def on_task_error(self, task, message):
+        self._end_job(task)
+        super().on_task_error(task, message)
+
+    def _end_job(self, task):
+        """正常结束、取消（含排队时取消）、被拒绝与出错都不再恢复，只有进程中断时日志保留"""
+        if self.journal and task.job_id:
+            self.journal.end(task.job_id)
+
     def validate_input(self, target_dir, file_paths):
         """业务逻辑验证"""
         if not target_dir:
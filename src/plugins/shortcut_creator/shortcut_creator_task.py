@@ -5,22 +5,38 @@ import win32com.client
 
 from core.base.base_task import BaseTask
 from core.utils.logger import logger
+from core.utils.task_journal import TaskJournal
 
 
 class ShortcutCreationTask(BaseTask):
-    """任务实体"""
+    """
+    任务实体
+    传入 journal 与 job_id 时逐个记录已创建的快捷方式，程序中断后以同一 job_id 重建任务即可跳过已完成的文件
+    resumed 为 True 时，日志中未记录的文件若在 target_dir 中已有指向它的快捷方式（创建后、记录前中断），直接沿用
+    任务日志的 end 由 service 在任务结束（含排队时取消、被拒绝）时调用
+    """
 
-    def __init__(self, target_dir, file_paths):
+    def __init__(self, target_dir, file_paths, journal: TaskJournal = None, job_id=None, resumed=False):
         super().__init__("ShortcutCreationTask")
         self.target_dir = os.path.abspath(target_dir)
         self.file_paths = [os.path.abspath(p) for p in file_paths]
         logger.debug(f"target_dir={target_dir}, file_paths={file_paths}")
         self.created_files = []
 
+        self.journal = journal
+        self.job_id = job_id
+        self.resumed = resumed
+
     def execute(self):
         """执行创建任务"""
         pythoncom.CoInitialize()
 
+        done = self.journal.completed(self.job_id) if self.journal else {}
+        if done:
+            logger.info(f"{self.name} 从断点继续，跳过 {len(done)} 个已创建的快捷方式")
+            # 恢复的快捷方式同样属于本次操作，取消时一并清理
+            self.created_files.extend(done.values())
+
         total_files = len(self.file_paths)
         try:
             for i, file_path in enumerate(self.file_paths):
@@ -29,9 +45,16 @@ class ShortcutCreationTask(BaseTask):
                     total_files = 0
                     break
 
-                self._create_single_shortcut(file_path, self.target_dir)
+                if file_path not in done:
+                    lnk_path = self.resumed and self._find_existing_shortcut(file_path, self.target_dir)
+                    if lnk_path:
+                        self.created_files.append(lnk_path)
+                    else:
+                        lnk_path = self._create_single_shortcut(file_path, self.target_dir)
+                    if self.journal:
+                        self.journal.record(self.job_id, file_path, lnk_path)
                 progress = int((i + 1) / total_files * 100)
-                self.progress.emit(progress)
+                self.report_progress(progress)
 
         finally:
             # 保证一定执行这里
@@ -68,6 +91,21 @@ class ShortcutCreationTask(BaseTask):
             import traceback
             raise RuntimeError(f"创建快捷方式失败: {file_name}\n{traceback.format_exc()}") from e
 
+    @staticmethod
+    def _find_existing_shortcut(target_path, output_dir):
+        """按 _create_single_shortcut 的命名规则查找已指向 target_path 的快捷方式"""
+        shell = win32com.client.Dispatch("WScript.Shell")
+        stem = os.path.splitext(os.path.basename(target_path))[0]
+        lnk_path = os.path.join(output_dir, f"{stem}.lnk")
+        counter = 1
+        while os.path.exists(lnk_path):
+            existing = shell.CreateShortCut(lnk_path).TargetPath
+            if os.path.normcase(os.path.abspath(existing)) == os.path.normcase(target_path):
+                return lnk_path
+            lnk_path = os.path.join(output_dir, f"{stem}_{counter}.lnk")
+            counter += 1
+        return None
+
     def _cleanup(self):
         """清理已创建的文件（业务逻辑）"""
         for file_path in self.created_files: